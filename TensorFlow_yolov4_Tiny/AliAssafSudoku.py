@@ -8,67 +8,204 @@ from itertools import product
 def solve_sudoku(size, grid):
     """ An efficient Sudoku solver using Algorithm X. """
 
-    R, C = size
-    N = R * C
-    X = ([("rc", rc) for rc in product(range(N), range(N))] +
-         [("rn", rn) for rn in product(range(N), range(1, N + 1))] +
-         [("cn", cn) for cn in product(range(N), range(1, N + 1))] +
-         [("bn", bn) for bn in product(range(N), range(1, N + 1))])
-    Y = dict()
-    for r, c, n in product(range(N), range(N), range(1, N + 1)):
-        b = (r // R) * R + (c // C) # Box number
-        Y[(r, c, n)] = [
-            ("rc", (r, c)),
-            ("rn", (r, n)),
-            ("cn", (c, n)),
-            ("bn", (b, n))]
-    X, Y = exact_cover(X, Y)
+    links = DancingLinks(size)
     for i, row in enumerate(grid):
         for j, n in enumerate(row):
             if n:
-                select(X, Y, (i, j, n))
-    for solution in solve(X, Y, []):
+                links.select((i, j, n))
+    for solution in links.solve():
         for (r, c, n) in solution:
             grid[r][c] = n
         yield grid
 
-def exact_cover(X, Y):
-    X = {j: set() for j in X}
-    for i, row in Y.items():
-        for j in row:
-            X[j].add(i)
-    return X, Y
-
-def solve(X, Y, solution):
-    if not X:
-        yield list(solution)
-    else:
-        c = min(X, key=lambda c: len(X[c]))
-        for r in list(X[c]):
-            solution.append(r)
-            cols = select(X, Y, r)
-            for s in solve(X, Y, solution):
-                yield s
-            deselect(X, Y, r, cols)
-            solution.pop()
-
-def select(X, Y, r):
-    cols = []
-    for j in Y[r]:
-        for i in X[j]:
-            for k in Y[i]:
-                if k != j:
-                    X[k].remove(i)
-        cols.append(X.pop(j))
-    return cols
-
-def deselect(X, Y, r, cols):
-    for j in reversed(Y[r]):
-        X[j] = cols.pop()
-        for i in X[j]:
-            for k in Y[i]:
-                if k != j:
-                    X[k].add(i)
+def count_solutions(grid, limit=2, size=(3, 3)):
+    """ Number of solutions of grid, the search stops at limit.
+        0 if the givens clash. grid is not modified. """
+
+    links = DancingLinks(size)
+    try:
+        for i, row in enumerate(grid):
+            for j, n in enumerate(row):
+                if n:
+                    links.select((i, j, n))
+    except KeyError:
+        return 0
+    count = 0
+    for _ in links.solve():
+        count += 1
+        if count >= limit:
+            break
+    return count
+
+class DancingLinks:
+    """ Algorithm X on Knuth's dancing links, kept in parallel integer lists.
+
+        Node 0 is the root, nodes 1 to 4 * N * N the column headers
+        ("rc", "rn", "cn" and "bn" constraints like in solve_sudoku) and
+        the other nodes the four entries of each (r, c, n) choice.
+
+        The empty structure of each size is built once and cached in
+        DancingLinks.templates, a new instance only copies its lists.
+    """
+
+    templates = {}
+
+    def __init__(self, size):
+        size = tuple(size)
+        template = DancingLinks.templates.get(size)
+        if template is None:
+            template = DancingLinks.templates[size] = DancingLinks._build(size)
+        self.template = template
+        self.N = template.N
+        # read only, shared with the template
+        self.first = template.first
+        self.choice = template.choice
+        self.L = template.L[:]
+        self.R = template.R[:]
+        self.U = template.U[:]
+        self.D = template.D[:]
+        self.C = template.C
+        self.S = template.S[:]
+        # rows tried by solve()
+        self.nodes = 0
+
+    def reset(self):
+        """ drop the selected givens, back to the empty structure in place """
+        template = self.template
+        self.L[:] = template.L
+        self.R[:] = template.R
+        self.U[:] = template.U
+        self.D[:] = template.D
+        self.S[:] = template.S
+        self.nodes = 0
+
+    @staticmethod
+    def _build(size):
+        R, C = size
+        N = R * C
+        links = object.__new__(DancingLinks)
+        links.N = N
+        columns = 4 * N * N
+        # header links
+        links.L = L = [i - 1 for i in range(columns + 1)]
+        links.R = Rl = [i + 1 for i in range(columns + 1)]
+        L[0] = columns
+        Rl[columns] = 0
+        links.U = U = list(range(columns + 1))
+        links.D = D = list(range(columns + 1))
+        links.C = Cl = list(range(columns + 1))
+        links.S = S = [0] * (columns + 1)
+        # first node of each choice, and choice of each node
+        links.first = first = []
+        links.choice = choice = [None] * (columns + 1)
+        for r, c, n in product(range(N), range(N), range(1, N + 1)):
+            b = (r // R) * R + (c // C) # Box number
+            node = len(Cl)
+            first.append(node)
+            for k, col in enumerate((1 + r * N + c,
+                                     1 + N * N + r * N + n - 1,
+                                     1 + 2 * N * N + c * N + n - 1,
+                                     1 + 3 * N * N + b * N + n - 1)):
+                L.append(node + (k - 1) % 4)
+                Rl.append(node + (k + 1) % 4)
+                U.append(U[col])
+                D.append(col)
+                D[U[col]] = node + k
+                U[col] = node + k
+                Cl.append(col)
+                S[col] += 1
+                choice.append((r, c, n))
+        return links
+
+    def cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    def select(self, choice):
+        """ keep a given (r, c, n). KeyError if it clashes with a previous one """
+        r, c, n = choice
+        N = self.N
+        # outside the grid the index would land on another cell's choice
+        if not (0 <= r < N and 0 <= c < N and 1 <= n <= N):
+            raise KeyError(choice)
+        node = self.first[(r * N + c) * N + n - 1]
+        L, R, C = self.L, self.R, self.C
+        j = node
+        while True:
+            col = C[j]
+            # a covered header is no longer linked from its neighbours
+            if R[L[col]] != col:
+                raise KeyError(choice)
+            self.cover(col)
+            j = R[j]
+            if j == node:
+                break
+
+    def solve(self):
+        """ yield each solution as a list of (r, c, n) choices """
+        L, R, D, C, S = self.L, self.R, self.D, self.C, self.S
+        cover, uncover, choice = self.cover, self.uncover, self.choice
+        stack = []
+        while True:
+            # forward: pick the column with the fewest rows and try its first row
+            node = None
+            if R[0] == 0:
+                yield [choice[i] for i in stack]
+            else:
+                c = R[0]
+                best = c
+                while c != 0:
+                    if S[c] < S[best]:
+                        best = c
+                    c = R[c]
+                if S[best]:
+                    cover(best)
+                    node = D[best]
+            # backward: move to the next row of the last column tried
+            while node is None:
+                if not stack:
+                    return
+                i = stack.pop()
+                j = L[i]
+                while j != i:
+                    uncover(C[j])
+                    j = L[j]
+                i = D[i]
+                if i == C[i]:
+                    # back to the header, no row left in this column
+                    uncover(i)
+                else:
+                    node = i
+            self.nodes += 1
+            stack.append(node)
+            j = R[node]
+            while j != node:
+                cover(C[j])
+                j = R[j]
 
 if __name__ == "__main__":
     grid = [
@@ -84,6 +221,11 @@ if __name__ == "__main__":
 
     print(*grid, sep='\n')
     print()
+    print("solutions (up to 2):", count_solutions(grid))
+    bad = [row[:] for row in grid]
+    bad[0][0] = 10
+    print("solutions with a 10 (0 expected):", count_solutions(bad))
+    print()
     for solution in solve_sudoku((3, 3), grid):
          print(*solution, sep='\n')
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare yolov3.utils.nms() with the previous one box at a time loop
+(loop_nms below): same boxes, same order and same scores for "nms" and
+"soft-nms", and the time of both over growing numbers of candidate boxes.
+
+The candidates look like the yolo output of a sudoku sheet: several jittered
+boxes around each digit of a 9x9 grid, with random classes and scores.
+
+Example:
+        $ python3 nmsBenchmark.py
+        $ python3 nmsBenchmark.py --boxes 100 1000 4000 --repeat 20
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from yolov3.utils import nms, bboxes_iou
+
+
+def loop_nms(bboxes, iou_threshold, sigma=0.3, method='nms'):
+    # yolov3.utils.nms() before vectorization, the reference
+    classes_in_img = list(set(bboxes[:, 5]))
+    best_bboxes = []
+
+    for cls in classes_in_img:
+        cls_mask = (bboxes[:, 5] == cls)
+        cls_bboxes = bboxes[cls_mask]
+        while len(cls_bboxes) > 0:
+            max_ind = np.argmax(cls_bboxes[:, 4])
+            best_bbox = cls_bboxes[max_ind]
+            best_bboxes.append(best_bbox)
+            cls_bboxes = np.concatenate([cls_bboxes[: max_ind], cls_bboxes[max_ind + 1:]])
+            iou = bboxes_iou(best_bbox[np.newaxis, :4], cls_bboxes[:, :4])
+            weight = np.ones((len(iou),), dtype=np.float32)
+
+            assert method in ['nms', 'soft-nms']
+
+            if method == 'nms':
+                iou_mask = iou > iou_threshold
+                weight[iou_mask] = 0.0
+
+            if method == 'soft-nms':
+                weight = np.exp(-(1.0 * iou ** 2 / sigma))
+
+            cls_bboxes[:, 4] = cls_bboxes[:, 4] * weight
+            score_mask = cls_bboxes[:, 4] > 0.
+            cls_bboxes = cls_bboxes[score_mask]
+
+    return best_bboxes
+
+
+def make_candidates(count, rnd, classes=10, cellSize=40.0):
+    """ return count (xmin, ymin, xmax, ymax, score, class) boxes over a 9x9 grid """
+    cells = rnd.integers(0, 81, count)
+    x = (cells % 9) * cellSize + rnd.normal(0, cellSize / 8, count)
+    y = (cells // 9) * cellSize + rnd.normal(0, cellSize / 8, count)
+    size = cellSize * rnd.uniform(0.6, 0.9, count)
+    scores = rnd.uniform(0.3, 1.0, count)
+    #  a few equal scores, the order between them must be kept
+    scores[::17] = 0.5
+    labels = rnd.integers(0, classes, count).astype(np.float64)
+    return np.stack([x, y, x + size, y + size, scores, labels], axis=1)
+
+
+def same_result(result, reference):
+    if len(result) != len(reference):
+        return False
+    return all(np.array_equal(box, ref) for box, ref in zip(result, reference))
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - startTime)
+    return min(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="nms micro-benchmark")
+    parser.add_argument("--boxes", type=int, nargs="+", default=[50, 200, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = np.random.default_rng(args.seed)
+    failed = False
+    print("{:9} {:>6} {:>10} {:>10} {:>8} {:>6}".format(
+        "method", "boxes", "loop ms", "nms ms", "speedup", "same"))
+    for count in args.boxes:
+        bboxes = make_candidates(count, rnd)
+        for method in ("nms", "soft-nms"):
+            same = same_result(nms(bboxes, 0.45, method=method),
+                               loop_nms(bboxes, 0.45, method=method))
+            failed = failed or not same
+            loopTime = best_time(lambda: loop_nms(bboxes, 0.45, method=method), args.repeat)
+            nmsTime = best_time(lambda: nms(bboxes, 0.45, method=method), args.repeat)
+            print("{:9} {:6} {:10.3f} {:10.3f} {:8.1f} {:>6}".format(
+                method, count, 1000 * loopTime, 1000 * nmsTime, loopTime / nmsTime,
+                "yes" if same else "NO"))
+    if failed:
+        print("nmsBenchmark - FAILED, the results differ")
+        sys.exit(1)
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Webcam pipeline shared by detect_sudoku.py and detect_Ali_sudoku.py.
+
+The capture, the detection and the solving run in their own threads,
+connected by bounded queues that drop the oldest item when full:
+
+    capture thread  - reads the webcam without pause (no driver buffer to
+                      flush), hands every frame to the display and the steady
+                      frames (no motion for steadyTime seconds) to the detection
+    detection thread- Hough rotation and YOLO detection of the newest steady frame
+    solve thread    - sorts the boxes into a grid, solves it and draws the solution
+    display         - the calling thread, shows the newest frame next to the last
+                      detection and solution, never waits for the detection
+
+Example:
+        pipeline = SudokuPipeline(webcam, detect, cache.solve, refID)
+        pipeline.run()          # returns when 'q' is pressed or the capture ends
+
+    Args (SudokuPipeline):
+    capture        - cv2.VideoCapture or any object with read() -> (ok, frame)
+    detect         - function(image) returning (drawn image, boxes) like yolov3 detect_img()
+    solve          - function(grid) returning the solution (list of rows) or None
+    refID          - class names of the yolo model (sudoku/sudoku.names)
+    flip(bool)     - optional - the camera is upside down. default = True
+    steadyTime     - optional - seconds without motion before detecting. default = 0.2
+    queueSize(int) - optional - frames waiting between two stages. default = 1
+    verbose(bool)  - optional - print the angle found. default = False
+    windowName     - optional - display window. default = "img"
+    timer          - optional - timer(stage) returns a context manager timing one run
+                     of the stage: "read", "motion", "track", "hough", "rotate", "detect",
+                     "sort" or "solve", like sudokuProfiler.StageProfiler. default = no timing
+    overlay(bool)  - optional - write the stage times of the timer (a StageProfiler)
+                     on the display, 'p' toggles it. default = False
+    tracking(bool) - optional - once a sheet is solved, keep its solution and skip the
+                     detection until the view moves or drifts away from the solved
+                     frame (SheetTracker). default = False
+
+    processFrame(frame, now) runs the stages of one frame in the calling thread
+    (no display), see sudokuReplay.py.
+
+    Functions:
+    read_names(path="sudoku/sudoku.names")
+                   - returns the class names of the yolo model (refID)
+    haughTransform(img, verbose=False)
+                   - returns the angle (radian) of the sheet lines or None
+    rotate_frame(frame, angle)
+                   - returns the frame rotated by -angle (radian)
+"""
+
+import copy
+import math
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from Statistic import Statistic
+from sudokuGridSorter import sudokuGridSorter
+
+STEADYTIME = 0.2
+QUEUESIZE = 1
+WAIT = 0.1          # seconds a stage waits for work before checking for stop
+MAXDRIFT = 8.0      # mean gray level difference from the solved frame that ends tracking
+
+
+class _NoTimer:
+    # timer doing nothing, the default of SudokuPipeline
+    def __call__(self, stage):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def read_names(path="sudoku/sudoku.names"):
+    """ return the non empty lines of the yolo class names file """
+    with open(path,"rt") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def haughTransform(img, verbose=False):
+    gray= cv2.cvtColor(img,cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray,50,150,apertureSize = 3)
+
+    lines = cv2.HoughLines(edges,1,np.pi/180,200)
+    if lines is None:
+        return None
+    statAngle = Statistic()
+    angleTable = []
+    for i in range(lines.shape[0]):
+        rho, theta = lines[i][0]
+        a = np.cos(theta)
+        b = np.sin(theta)
+        x0 = a*rho
+        y0 = b*rho
+        x1 = int(x0 + 1000*(-b))
+        y1 = int(y0 + 1000*(a))
+        x2 = int(x0 - 1000*(-b))
+        y2 = int(y0 - 1000*(a))
+
+        dy = y2 - y1
+        dx = x2 - x1
+        if abs(dx) > abs(dy):
+            if x1 < x2:
+                angle = math.atan2(-dy,dx)
+            else:
+                angle = math.atan2(dy,dx)
+        else:
+            if y1 < y2:
+                angle = math.atan2(dx,dy)
+            else:
+                angle = math.atan2(-dx,-dy)
+        angleTable.append(angle)
+        statAngle.add(angle)
+    # reject any angle higher than  5 degree  from target
+    targetAngle=statAngle.mean()
+    maxDegree = 5 * math.pi / 180
+    statAngle.clear()
+    for angle in angleTable:
+        if (abs(angle -targetAngle)) <   maxDegree:
+            statAngle.add(angle)
+    if statAngle.count > 0:
+        targetAngle = statAngle.mean()
+
+    if verbose:
+        print("Best angle :", 180.0 * targetAngle / math.pi)
+    return targetAngle
+
+
+def rotate_frame(frame, angle):
+    """ return the frame rotated to cancel the sheet angle (radian) """
+    image_center = tuple(np.array(frame.shape[1::-1]) / 2)
+    rot_mat = cv2.getRotationMatrix2D(image_center, -angle * 180.0 / math.pi, 1.0)
+    return cv2.warpAffine(frame, rot_mat, frame.shape[1::-1], flags=cv2.INTER_LINEAR)
+
+
+class MotionDetector:
+    """ tell if the camera view is steady, from the difference of two frames """
+
+    def __init__(self, steadyTime=STEADYTIME, threshold=30, minArea=10):
+        self.steadyTime = steadyTime
+        self.threshold = threshold
+        self.minArea = minArea
+        self.previousFrame = None
+        self.lastMotion = None
+        self.moved = False
+
+    @staticmethod
+    def prepare(frame):
+        """ return the blurred gray image compared between frames """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (21,21),0)
+
+    def update(self, frame, now):
+        """ return True when nothing moved for steadyTime seconds at time now.
+            moved tells if this frame differs from the previous one """
+        gray = self.prepare(frame)
+        previousFrame = self.previousFrame
+        self.previousFrame = gray
+        self.moved = False
+        if previousFrame is None:
+            self.lastMotion = now
+            return self.steadyTime <= 0
+        diff_frame = cv2.absdiff(previousFrame,gray)
+        thresh_frame = cv2.threshold(diff_frame,self.threshold,255, cv2.THRESH_BINARY)[1]
+        thresh_frame = cv2.dilate(thresh_frame, None, iterations = 2)
+        cnts,_ = cv2.findContours(thresh_frame,cv2.RETR_EXTERNAL,
+                                  cv2.CHAIN_APPROX_SIMPLE)
+        for contour in cnts:
+            if cv2.contourArea(contour) >= self.minArea:
+                self.lastMotion = now
+                self.moved = True
+                break
+        return now - self.lastMotion >= self.steadyTime
+
+
+class SheetTracker:
+    """ keep the last solved sheet while the view stays the same.
+
+        The frame to frame motion detection misses slow changes (a sheet
+        slowly pushed, the light going down), so the tracking confidence
+        compares each frame with the frame the sheet was solved on: the
+        tracking ends when their mean difference reaches maxDrift.
+    """
+
+    def __init__(self, maxDrift=MAXDRIFT):
+        self.maxDrift = maxDrift
+        self.state = None
+        self.trackedFrames = 0
+
+    @property
+    def locked(self):
+        return self.state is not None
+
+    @property
+    def solution(self):
+        state = self.state
+        return None if state is None else state["solution"]
+
+    def lock(self, reference, gridSorter, solution):
+        """ track the sheet of gridSorter, solved on the frame whose blurred gray
+            image is reference """
+        #  one assignment, read at once by the capture thread
+        self.state = {"reference": reference,
+                      "grid": gridSorter.grid,
+                      "solution": solution,
+                      "sudokuBoxCenter": gridSorter.sudokuBoxCenter,
+                      "digitsSpacing": gridSorter.digitsSpacing}
+
+    def release(self):
+        self.state = None
+
+    def confidence(self, gray):
+        """ return 1.0 for the solved frame down to 0.0 at maxDrift """
+        state = self.state
+        if state is None or state["reference"].shape != gray.shape:
+            return 0.0
+        drift = float(cv2.absdiff(state["reference"], gray).mean())
+        return max(0.0, 1.0 - drift / self.maxDrift)
+
+    def check(self, gray, moved):
+        """ return True while the sheet is still tracked on this frame """
+        if self.state is None:
+            return False
+        if moved or self.confidence(gray) <= 0.0:
+            self.release()
+            return False
+        self.trackedFrames += 1
+        return True
+
+
+class LatestQueue(queue.Queue):
+    """ bounded queue, put() drops the oldest item instead of blocking """
+
+    def __init__(self, maxsize=QUEUESIZE):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=False, timeout=None):
+        while True:
+            try:
+                return super().put(item, block=False)
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class SudokuPipeline:
+    """ threaded capture / detection / solve / display loop, see module help """
+
+    def __init__(self, capture, detect, solve, refID, flip=True,
+                 steadyTime=STEADYTIME, queueSize=QUEUESIZE, verbose=False,
+                 windowName="img", timer=None, overlay=False, tracking=False):
+        self.capture = capture
+        self.detect = detect
+        self.solve = solve
+        self.refID = refID
+        self.flip = flip
+        self.verbose = verbose
+        self.windowName = windowName
+        self.timer = _NoTimer() if timer is None else timer
+        self.overlay = overlay
+        self.motion = MotionDetector(steadyTime)
+        self.tracker = SheetTracker() if tracking else None
+        self.displayQueue = LatestQueue(queueSize)
+        self.detectQueue = LatestQueue(queueSize)
+        self.solveQueue = LatestQueue(queueSize)
+        self.stopped = threading.Event()
+        self.error = None
+        #  last results shown, replaced (never modified) by the stages
+        self.tfFrame = None
+        self.sudokuFrame = None
+        self.blank = None
+
+    # stages, also usable one frame at a time without the threads
+
+    def read(self):
+        """ return the next camera frame, None at the end of the capture """
+        with self.timer("read"):
+            ok, frame = self.capture.read()
+            if not ok or frame is None:
+                return None
+            if self.flip:
+                frame = cv2.flip(frame,-1)
+        return frame
+
+    def isSteady(self, frame, now):
+        """ return True when the view didn't move for steadyTime seconds """
+        with self.timer("motion"):
+            return self.motion.update(frame, now)
+
+    def isTracked(self):
+        """ return True when the solved sheet is still in view, call after
+            isSteady() for the same frame """
+        if self.tracker is None:
+            return False
+        with self.timer("track"):
+            return self.tracker.check(self.motion.previousFrame, self.motion.moved)
+
+    def needsDetection(self, frame, now):
+        """ return True when the frame is steady and no sheet is tracked """
+        steady = self.isSteady(frame, now)
+        return not self.isTracked() and steady
+
+    def detectFrame(self, frame):
+        """ return (rotated frame, boxes), (frame, None) when no sheet angle is found """
+        with self.timer("hough"):
+            sudokuAngle = haughTransform(frame, self.verbose)
+            if sudokuAngle is None:
+                return frame, None
+        with self.timer("rotate"):
+            rotatedFrame = rotate_frame(frame, sudokuAngle)
+        with self.timer("detect"):
+            self.tfFrame, boxes = self.detect(copy.deepcopy(rotatedFrame))
+        return rotatedFrame, boxes
+
+    def solveFrame(self, rotatedFrame, boxes, frame=None):
+        """ sort and solve the boxes, return the solution or None. With
+            tracking, frame (before rotation) is the reference of the sheet """
+        if boxes is None:
+            self.sudokuFrame = None
+            return None
+        with self.timer("sort"):
+            gridSorter = sudokuGridSorter(boxes,self.refID,None,0)
+            isSorted = gridSorter.sortGrid()
+        if not isSorted:
+            self.sudokuFrame = None
+            return None
+        with self.timer("solve"):
+            gridSolver = self.solve(gridSorter.grid)
+            if gridSolver is not None:
+                sudokuFrame = copy.deepcopy(rotatedFrame)
+                gridSorter.show(sudokuFrame,gridSolver)
+                self.sudokuFrame = sudokuFrame
+                if self.tracker is not None and frame is not None:
+                    self.tracker.lock(MotionDetector.prepare(frame), gridSorter, gridSolver)
+        return gridSolver
+
+    def processFrame(self, frame, now):
+        """ run the motion, detection and solve stages of one frame, return
+            the solution or None. A tracked sheet returns its solution """
+        if not self.needsDetection(frame, now):
+            return self.tracker.solution if self.tracker is not None else None
+        return self.solveFrame(*self.detectFrame(frame), frame)
+
+    def compose(self, frame):
+        """ return the frame next to the last detection and solution """
+        if self.blank is None or self.blank.shape != frame.shape:
+            self.blank = np.full_like(frame, 255)
+        tfFrame = self.tfFrame
+        sudokuFrame = self.sudokuFrame
+        frames = np.hstack((frame,
+                            self.blank if tfFrame is None else tfFrame,
+                            self.blank if sudokuFrame is None else sudokuFrame))
+        if self.overlay:
+            self.timer.overlay(frames)
+        return frames
+
+    # threads
+
+    def _captureLoop(self, clock):
+        while not self.stopped.is_set():
+            frame = self.read()
+            if frame is None:
+                break
+            self.displayQueue.put(frame)
+            if self.needsDetection(frame, clock()):
+                self.detectQueue.put(frame)
+
+    def _detectLoop(self):
+        while not self.stopped.is_set():
+            try:
+                frame = self.detectQueue.get(timeout=WAIT)
+            except queue.Empty:
+                continue
+            self.solveQueue.put(self.detectFrame(frame) + (frame,))
+
+    def _solveLoop(self):
+        while not self.stopped.is_set():
+            try:
+                rotatedFrame, boxes, frame = self.solveQueue.get(timeout=WAIT)
+            except queue.Empty:
+                continue
+            self.solveFrame(rotatedFrame, boxes, frame)
+
+    def _worker(self, loop, *args):
+        # a failing stage stops the pipeline, run() raises its error
+        try:
+            loop(*args)
+        except BaseException as error:
+            if self.error is None:
+                self.error = error
+        finally:
+            self.stopped.set()
+
+    def start(self):
+        """ start the capture, detection and solve threads """
+        self.stopped.clear()
+        self.error = None
+        self.threads = [threading.Thread(target=self._worker, args=args, daemon=True)
+                        for args in ((self._captureLoop, time.time),
+                                     (self._detectLoop,), (self._solveLoop,))]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """ stop and join the threads, raise the error of a failed stage """
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        """ show the pipeline until 'q' is pressed or the capture ends """
+        cv2.namedWindow(self.windowName,cv2.WINDOW_NORMAL)
+        self.start()
+        try:
+            resized = False
+            while not self.stopped.is_set():
+                try:
+                    frame = self.displayQueue.get(timeout=WAIT)
+                except queue.Empty:
+                    continue
+                if not resized:
+                    cv2.resizeWindow(self.windowName,frame.shape[1]*3,frame.shape[0])
+                    resized = True
+                cv2.imshow(self.windowName,self.compose(frame))
+                key = cv2.waitKey(1)
+                if key == ord('q'):
+                    break
+                if key == ord('p') and hasattr(self.timer, "overlay"):
+                    self.overlay = not self.overlay
+        finally:
+            self.stop()
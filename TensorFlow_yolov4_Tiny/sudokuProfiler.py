@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage latency profiler of the webcam pipeline.
+
+A StageProfiler is the timer of SudokuPipeline and of yolov3 detect_img():
+profiler(stage) is a context manager timing one run of the stage. Only the
+last window runs of each stage are kept, so the statistics follow the
+current scene. The stages nest: "detect" holds the yolo stages.
+
+    pipeline stages  - read, motion, track, hough, rotate (cv2.warpAffine), detect, sort,
+                       solve
+    detect_img()     - preprocess (image_preprocess), predict (Yolo.predict),
+                       postprocess (postprocess_boxes), nms, draw
+
+Example:
+        profiler = StageProfiler(dumpPath="profile.json", dumpInterval=10)
+        detect = lambda image: detect_img(yolo, image, "", timer=profiler)
+        pipeline = SudokuPipeline(webcam, detect, cache.solve, refID, timer=profiler)
+        with profiler("solve"):
+            ...
+        print(profiler.summary()["solve"]["p95Ms"])
+
+    Args (StageProfiler):
+    window(int)    - optional - runs kept per stage, None keeps all. default = 300
+    dumpPath(str)  - optional - JSON file rewritten with summary() every dumpInterval
+                     seconds. default = None (no dump)
+    dumpInterval   - optional - seconds between two dumps. default = 10.0
+
+    Methods:
+    add(stage, seconds)
+                   - records a run measured elsewhere
+    summary()      - returns count, mean, p50/p95/p99/max (ms) and the histogram of
+                     each stage, in STAGES order
+    overlay(image) - writes the mean and p95 of each stage on the image (in place)
+    dump(path=None)- writes the summary as JSON
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 300
+DUMPINTERVAL = 10.0
+PERCENTILES = (50, 95, 99)
+STAGES = ("frame", "read", "motion", "track", "hough", "rotate", "detect", "preprocess",
+          "predict", "postprocess", "nms", "draw", "sort", "solve")
+#  upper bounds (ms) of the histogram buckets, the last bucket is above them
+BUCKETS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _percentile(values, percent):
+    # nearest rank percentile of sorted values
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[rank - 1]
+
+
+class StageProfiler:
+    """ rolling latency of the pipeline stages, see module help """
+
+    def __init__(self, window=WINDOW, dumpPath=None, dumpInterval=DUMPINTERVAL,
+                 clock=time.perf_counter):
+        self.window = window
+        self.dumpPath = dumpPath
+        self.dumpInterval = dumpInterval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.nextDump = time.time() + dumpInterval
+
+    @contextmanager
+    def __call__(self, stage):
+        startTime = self.clock()
+        try:
+            yield
+        finally:
+            self.add(stage, self.clock() - startTime)
+
+    def add(self, stage, seconds):
+        """ record one run of stage """
+        dumpNow = False
+        with self.lock:
+            values = self.samples.get(stage)
+            if values is None:
+                values = self.samples[stage] = deque(maxlen=self.window)
+            values.append(seconds)
+            #  only the thread moving nextDump writes this dump
+            if self.dumpPath is not None and time.time() >= self.nextDump:
+                self.nextDump = time.time() + self.dumpInterval
+                dumpNow = True
+        if dumpNow:
+            self.dump()
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        """ return the statistics of each stage, see module help """
+        with self.lock:
+            snapshot = dict((stage, sorted(values)) for stage, values in self.samples.items())
+        result = {}
+        order = [stage for stage in STAGES if stage in snapshot]
+        order += sorted(stage for stage in snapshot if stage not in STAGES)
+        for stage in order:
+            values = snapshot[stage]
+            if not values:
+                continue
+            entry = {"count": len(values), "meanMs": 1000 * sum(values) / len(values)}
+            for percent in PERCENTILES:
+                entry["p{}Ms".format(percent)] = 1000 * _percentile(values, percent)
+            entry["maxMs"] = 1000 * values[-1]
+            histogram = [0] * (len(BUCKETS) + 1)
+            for value in values:
+                histogram[bisect.bisect_left(BUCKETS, 1000 * value)] += 1
+            entry["histogram"] = histogram
+            result[stage] = entry
+        return result
+
+    def dump(self, path=None):
+        """ write the summary as JSON, replacing the file at once """
+        path = path or self.dumpPath
+        report = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "bucketsMs": list(BUCKETS),
+                  "stages": self.summary()}
+        #  a temporary file of its own, a dump() called meanwhile can't take it
+        handle, temporary = tempfile.mkstemp(suffix=".tmp",
+                                             dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(handle, "w") as stream:
+                json.dump(report, stream, indent=2)
+                stream.write("\n")
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def overlay(self, image, origin=(10, 20), color=(0, 0, 255)):
+        """ write mean and p95 (ms) of each stage on the image """
+        import cv2
+        x, y = origin
+        for stage, entry in self.summary().items():
+            text = "{:11} {:7.1f} {:7.1f}".format(stage, entry["meanMs"], entry["p95Ms"])
+            cv2.putText(image, text, (x, y), cv2.FONT_HERSHEY_PLAIN, 1.0, color, 1)
+            y += 16
+        return image
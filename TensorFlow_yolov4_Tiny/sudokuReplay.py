@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replay a video file or a folder of frames through the webcam pipeline of
+detect_sudoku.py without camera nor window, and report the latency of each
+stage and the frames per second.
+
+The frames go one by one through SudokuPipeline.processFrame(): motion,
+Hough rotation, YOLO detection, grid sorting and solving. The motion
+detection uses the time of the frame in the video (frame number / frame
+rate), so a replay gives the same steady frames on a slow or a fast machine
+and the solutions found can be compared between runs (--json).
+
+Example:
+        $ python3 sudokuReplay.py sheet.mp4
+        $ python3 sudokuReplay.py sudoku/new --steady 0 --json replay.json
+          (a folder of still pictures like grabImage.py saves, every one detected)
+
+    Args (command):
+    source         - video file or folder of .jpg/.png frames (sorted by name)
+    --fps          - frame rate of a folder, or of a video that doesn't tell. default = 30
+    --steady       - seconds without motion before detecting, 0 detects every frame.
+                     default = 0.2
+    --flip         - turn the frames upside down like the webcam scripts
+    --limit        - frames replayed. default = all
+    --no-cache     - solve every frame again instead of using sudokuCache
+    --tracking     - skip the detection while a solved sheet stays in view
+    --json FILE    - write the report as JSON to FILE, '-' for stdout
+
+    Functions:
+    open_source(path)
+                   - returns a capture object (read() -> (ok, frame)) of a video or folder
+    replay(pipeline, frameRate=FRAMERATE, limit=None)
+                   - returns the report of a replay, a dictionary ready for json.dump()
+"""
+
+import glob
+import os
+import time
+
+import cv2
+
+from sudokuPipeline import SudokuPipeline, STEADYTIME, read_names
+from sudokuProfiler import StageProfiler
+
+FRAMERATE = 30.0
+IMAGE_TYPES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FolderCapture:
+    """ read the pictures of a folder, in name order, like a cv2.VideoCapture """
+
+    def __init__(self, folder):
+        self.files = sorted(name for name in glob.glob(os.path.join(folder, "*"))
+                            if name.lower().endswith(IMAGE_TYPES))
+        self.index = 0
+
+    def read(self):
+        if self.index >= len(self.files):
+            return False, None
+        frame = cv2.imread(self.files[self.index])
+        self.index += 1
+        return frame is not None, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        return 0.0
+
+    def release(self):
+        pass
+
+
+def open_source(path):
+    """ return a capture object of a video file or a folder of frames """
+    if os.path.isdir(path):
+        return FolderCapture(path)
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise FileNotFoundError("sudokuReplay - can't open {}".format(path))
+    return capture
+
+
+def replay(pipeline, frameRate=FRAMERATE, limit=None):
+    """ run every frame of the pipeline capture, see module help. A pipeline
+        timer other than a StageProfiler is replaced by one keeping every run """
+    timer = pipeline.timer
+    if not isinstance(timer, StageProfiler):
+        timer = pipeline.timer = StageProfiler(window=None)
+    frames = 0
+    solutions = []
+    startTime = time.perf_counter()
+    while limit is None or frames < limit:
+        frameStart = time.perf_counter()
+        frame = pipeline.read()
+        if frame is None:
+            break
+        solution = pipeline.processFrame(frame, frames / frameRate)
+        #  end to end time of the frame, from read to solution
+        timer.add("frame", time.perf_counter() - frameStart)
+        if solution is not None:
+            solutions.append({"frame": frames,
+                              "grid": "".join(str(Number) for row in solution
+                                              for Number in row)})
+        frames += 1
+    seconds = time.perf_counter() - startTime
+    return {
+        "frames": frames,
+        "seconds": seconds,
+        "fps": frames / seconds if seconds else 0.0,
+        "detectedFrames": len(timer.samples.get("hough", ())),
+        "solvedFrames": len(solutions),
+        "trackedFrames": pipeline.tracker.trackedFrames if pipeline.tracker else 0,
+        "stages": timer.summary(),
+        "solutions": solutions,
+        }
+
+
+def print_report(report):
+    print("sudokuReplay - {} frames in {:6.2f} seconds, {:6.1f} fps, {} detected, {} solved, "
+          "{} tracked".format(report["frames"], report["seconds"], report["fps"],
+                              report["detectedFrames"], report["solvedFrames"],
+                              report["trackedFrames"]))
+    print("{:11} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "stage", "count", "mean ms", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for stage, entry in report["stages"].items():
+        print("{:11} {:7} {:9.2f} {:9.2f} {:9.2f} {:9.2f} {:9.2f}".format(
+            stage, entry["count"], entry["meanMs"], entry["p50Ms"], entry["p95Ms"],
+            entry["p99Ms"], entry["maxMs"]))
+
+
+def load_detector(timer=None):
+    """ return detect(image) -> (drawn image, boxes) with the trained yolo model,
+        timer (a StageProfiler) times the yolo stages """
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+    from yolov3.yolov4 import Create_Yolo
+    from yolov3.utils import detect_img
+    from yolov3.configs import YOLO_INPUT_SIZE, TRAIN_CLASSES, TRAIN_MODEL_NAME
+
+    yolo = Create_Yolo(input_size=YOLO_INPUT_SIZE, CLASSES=TRAIN_CLASSES)
+    yolo.load_weights(f"./checkpoints/{TRAIN_MODEL_NAME}")
+
+    options = {} if timer is None else {"timer": timer}
+
+    def detect(image):
+        return detect_img(yolo, image, "", input_size=YOLO_INPUT_SIZE, show=False,
+                          CLASSES=TRAIN_CLASSES, rectangle_colors=(255,0,0), **options)
+    return detect
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    from sudokuCache import SolutionCache
+
+    parser = argparse.ArgumentParser(description="replay frames through the sudoku pipeline")
+    parser.add_argument("source", help="video file or folder of frames")
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--steady", type=float, default=STEADYTIME)
+    parser.add_argument("--flip", action="store_true")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--no-cache", dest="cache", action="store_false")
+    parser.add_argument("--tracking", action="store_true")
+    parser.add_argument("--json", metavar="FILE")
+    args = parser.parse_args()
+
+    capture = open_source(args.source)
+    frameRate = args.fps or capture.get(cv2.CAP_PROP_FPS) or FRAMERATE
+    cache = SolutionCache() if args.cache else SolutionCache(maxSize=0)
+    profiler = StageProfiler(window=None)
+    pipeline = SudokuPipeline(capture, load_detector(profiler), cache.solve, read_names(),
+                              flip=args.flip, steadyTime=args.steady, timer=profiler,
+                              tracking=args.tracking)
+    report = replay(pipeline, frameRate, args.limit)
+    capture.release()
+    report["source"] = args.source
+    report["cache"] = cache.info()
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as stream:
+                json.dump(report, stream, indent=2)
+                stream.write("\n")
@@ -9,6 +9,7 @@
 #
 #================================================================
 from multiprocessing import Process, Queue, Pipe
+from contextlib import nullcontext
 import cv2
 import time
 import random
@@ -193,37 +194,49 @@ def nms(bboxes, iou_threshold, sigma=0.3, method='nms'):
 
     Note: soft-nms, https://arxiv.org/pdf/1704.04503.pdf
           https://github.com/bharatsingh430/soft-nms
+
+    The boxes are returned per class (in set order), best score first, the same
+    as the original one box at a time loop (see nmsBenchmark.py).
     """
     classes_in_img = list(set(bboxes[:, 5]))
+    if not classes_in_img:
+        return []
+    assert method in ['nms', 'soft-nms']
+
+    if method == 'nms':
+        best_bboxes = []
+        for cls in classes_in_img:
+            cls_bboxes = bboxes[bboxes[:, 5] == cls]
+            # sort once, stable so equal scores keep the order np.argmax would pick
+            cls_bboxes = cls_bboxes[np.argsort(-cls_bboxes[:, 4], kind='stable')]
+            iou = bboxes_iou(cls_bboxes[:, np.newaxis, :4], cls_bboxes[np.newaxis, :, :4])
+            suppress = iou > iou_threshold
+            # the best box is always kept, the next ones need a positive score
+            candidates = np.concatenate(([0], 1 + np.flatnonzero(cls_bboxes[1:, 4] > 0.)))
+            keep = []
+            while candidates.size:
+                best = candidates[0]
+                keep.append(best)
+                candidates = candidates[1:][~suppress[best, candidates[1:]]]
+            best_bboxes.extend(cls_bboxes[keep])
+        return best_bboxes
+
+    # soft-nms, each choice depends on the scores lowered by the previous ones
     best_bboxes = []
-
     for cls in classes_in_img:
-        cls_mask = (bboxes[:, 5] == cls)
-        cls_bboxes = bboxes[cls_mask]
-        # Process 1: Determine whether the number of bounding boxes is greater than 0 
-        while len(cls_bboxes) > 0:
-            # Process 2: Select the bounding box with the highest score according to socre order A
-            max_ind = np.argmax(cls_bboxes[:, 4])
-            best_bbox = cls_bboxes[max_ind]
+        cls_bboxes = bboxes[bboxes[:, 5] == cls]
+        iou = bboxes_iou(cls_bboxes[:, np.newaxis, :4], cls_bboxes[np.newaxis, :, :4])
+        scores = cls_bboxes[:, 4].copy()
+        alive = np.ones(len(cls_bboxes), dtype=bool)
+        while alive.any():
+            max_ind = np.argmax(np.where(alive, scores, -np.inf))
+            best_bbox = cls_bboxes[max_ind].copy()
+            best_bbox[4] = scores[max_ind]
             best_bboxes.append(best_bbox)
-            cls_bboxes = np.concatenate([cls_bboxes[: max_ind], cls_bboxes[max_ind + 1:]])
-            # Process 3: Calculate this bounding box A and
-            # Remain all iou of the bounding box and remove those bounding boxes whose iou value is higher than the threshold 
-            iou = bboxes_iou(best_bbox[np.newaxis, :4], cls_bboxes[:, :4])
-            weight = np.ones((len(iou),), dtype=np.float32)
-
-            assert method in ['nms', 'soft-nms']
-
-            if method == 'nms':
-                iou_mask = iou > iou_threshold
-                weight[iou_mask] = 0.0
-
-            if method == 'soft-nms':
-                weight = np.exp(-(1.0 * iou ** 2 / sigma))
-
-            cls_bboxes[:, 4] = cls_bboxes[:, 4] * weight
-            score_mask = cls_bboxes[:, 4] > 0.
-            cls_bboxes = cls_bboxes[score_mask]
+            alive[max_ind] = False
+            weight = np.exp(-(1.0 * iou[max_ind, alive] ** 2 / sigma))
+            scores[alive] = scores[alive] * weight
+            alive &= scores > 0.
 
     return best_bboxes
 
@@ -269,28 +282,37 @@ def postprocess_boxes(pred_bbox, original_image, input_size, score_threshold):
     return np.concatenate([coors, scores[:, np.newaxis], classes[:, np.newaxis]], axis=-1)
 
 
-def detect_img(Yolo, original_image, output_path, input_size=416, show=False, CLASSES=YOLO_COCO_CLASSES, score_threshold=0.3, iou_threshold=0.45, rectangle_colors=''):
-    image_data = image_preprocess(np.copy(original_image), [input_size, input_size])
-    image_data = image_data[np.newaxis, ...].astype(np.float32)
+def _no_timer(stage):
+    return nullcontext()
 
-    if YOLO_FRAMEWORK == "tf":
-        pred_bbox = Yolo.predict(image_data)
-    elif YOLO_FRAMEWORK == "trt":
-        batched_input = tf.constant(image_data)
-        result = Yolo(batched_input)
-        pred_bbox = []
-        for key, value in result.items():
-            value = value.numpy()
-            pred_bbox.append(value)
+def detect_img(Yolo, original_image, output_path, input_size=416, show=False, CLASSES=YOLO_COCO_CLASSES, score_threshold=0.3, iou_threshold=0.45, rectangle_colors='', timer=_no_timer):
+    # timer(stage) returns a context manager timing the stage (see sudokuProfiler.py)
+    with timer("preprocess"):
+        image_data = image_preprocess(np.copy(original_image), [input_size, input_size])
+        image_data = image_data[np.newaxis, ...].astype(np.float32)
+
+    with timer("predict"):
+        if YOLO_FRAMEWORK == "tf":
+            pred_bbox = Yolo.predict(image_data)
+        elif YOLO_FRAMEWORK == "trt":
+            batched_input = tf.constant(image_data)
+            result = Yolo(batched_input)
+            pred_bbox = []
+            for key, value in result.items():
+                value = value.numpy()
+                pred_bbox.append(value)
 
-    pred_bbox = [tf.reshape(x, (-1, tf.shape(x)[-1])) for x in pred_bbox]
-    pred_bbox = tf.concat(pred_bbox, axis=0)
+    with timer("postprocess"):
+        pred_bbox = [tf.reshape(x, (-1, tf.shape(x)[-1])) for x in pred_bbox]
+        pred_bbox = tf.concat(pred_bbox, axis=0)
 
-    bboxes = postprocess_boxes(pred_bbox, original_image, input_size, score_threshold)
-    bboxes = nms(bboxes, iou_threshold, method='nms')
+        bboxes = postprocess_boxes(pred_bbox, original_image, input_size, score_threshold)
+    with timer("nms"):
+        bboxes = nms(bboxes, iou_threshold, method='nms')
 
 
-    image = draw_bbox(original_image, bboxes, CLASSES=CLASSES, rectangle_colors=rectangle_colors,show_confidence = False)
+    with timer("draw"):
+        image = draw_bbox(original_image, bboxes, CLASSES=CLASSES, rectangle_colors=rectangle_colors,show_confidence = False)
 
     if output_path != '': cv2.imwrite(output_path, image)
     if show:
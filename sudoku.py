@@ -8,6 +8,9 @@ this example  show how fill manually the
 sudoku grid usign the keyboard.
 The space bar is converted to '0'
 '0' correspond to an empty case
+
+python3 sudoku.py puzzles.txt  uses the first puzzle of
+the file (81 characters per line) as the test grid
 """
 
 # Copyright © 2020, Daniel Perron
@@ -34,6 +37,7 @@ The space bar is converted to '0'
 
 import time
 from sudokuSolver import sudokuSolver, SudokuDeepLevelError, SudokuTimeLimitError
+from sudokuPuzzleFile import read_puzzles
 import string
 import sys
 
@@ -59,6 +63,10 @@ target_sudoku = [
     [0,9,0,0,0,0,4,0,0]
     ]
 
+#  python3 sudoku.py puzzles.txt : the test grid is the first puzzle of the file
+if len(sys.argv) > 1:
+    target_sudoku = next(read_puzzles(sys.argv[1]), [])
+
 
 if sys.platform != "win32":
 #
@@ -117,7 +125,7 @@ if sys.platform != "win32":
 #            uneligne=get_a_line(row_idx)
             for col_idx in range(9):
                 key = get_a_char()
-                mysudoku.grid[row_idx][col_idx] = int(key)
+                mysudoku.setCell(row_idx, col_idx, int(key))
                 print("{} ".format(key), end="")
                 sys.stdout.flush()
                 if (col_idx % 3) == 2:
@@ -172,7 +180,7 @@ else:
         for row_idx in range(9):
             uneligne=get_a_line(row_idx)
             for col_idx in range(9):
-                mysudoku.grid[row_idx][col_idx] = int(uneligne[col_idx])
+                mysudoku.setCell(row_idx, col_idx, int(uneligne[col_idx]))
         return True
 
     def get_answer():
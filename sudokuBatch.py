@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Solve many sudoku grids at once with NumPy.
+
+A batch of B grids is held as a (B, cells) array of digits. Each pass builds
+the (B, cells, N) boolean candidate tensor of the whole batch and places
+every naked single (a cell with one candidate) and hidden single (a digit
+with one place in a row, column or box) of every grid with array operations.
+The passes go on until no grid of the batch moves. Most newspaper grids are
+finished there; only the grids left undecided go to the scalar sudokuSolver,
+starting from what the batch already deduced.
+
+Example:
+        from sudokuBatch import solve_batch
+        from sudokuPuzzleFile import read_puzzles
+        for result in solve_batch(read_puzzles("puzzles.txt", encoded=True)):
+            print(result.index, result.status)
+
+    Args (solve_batch):
+    grids          - iterable of grids (lists of rows or encode_grid() bytes)
+    batchSize(int) - optional - number of grids propagated together. default = 4096
+    encoded(bool)  - optional - yield the solved grids as bytes. default = False
+    size(tuple)    - optional - (R, C) box size, see sudokuSolver. default = (3, 3)
+    other keyword arguments are passed to the sudokuSolver of the undecided grids
+    (deepLevelMax, maxTime, maxNodes...)
+
+    Yields sudokuSolver.SudokuResult(index, status, grid, deepestLevel, seconds,
+    nodes, steps, partial) for every grid, in the input order. The grids
+    finished by the batch report deepestLevel, nodes and steps as 0 and their
+    share of the batch time in seconds.
+
+    Functions:
+    propagate_batch(cells, size=(3, 3))
+                   - applies the singles to a (B, cells) uint8 array in place and
+                     returns the (B,) status array: OPEN (undecided), DONE (solved),
+                     DEAD (no solution) or BROKEN (givens clash or too few givens)
+
+    A self-test comparing solve_batch() and sudokuSolver.solve_many() over the
+    bundled corpora is run with:
+        $ python sudokuBatch.py
+"""
+
+import time
+from itertools import islice
+
+import numpy as np
+
+from sudokuSolver import (sudokuSolver, SudokuShape, SudokuResult, SOLVED, INVALID,
+                          UNSOLVABLE, encode_grid, decode_grid)
+
+BATCHSIZE = 4096
+
+#  propagate_batch() status of each grid
+OPEN = 0
+DONE = 1
+DEAD = 2
+BROKEN = 3
+
+#  index arrays of each shape: (units, places) and (cells, 3)
+_tables = {}
+
+
+def _getTables(size):
+    tables = _tables.get(size)
+    if tables is None:
+        shape = SudokuShape.get(size)
+        tables = _tables[size] = (shape,
+                                  np.array(shape.units, dtype=np.intp),
+                                  np.array(shape.cellUnits, dtype=np.intp),
+                                  np.arange(1, shape.N + 1, dtype=np.uint8))
+    return tables
+
+
+def propagate_batch(cells, size=(3, 3)):
+    """ place the naked and hidden singles of a (B, cells) uint8 array in place
+        until no grid moves, return the status of each grid (see module help)
+    """
+    shape, units, cellUnits, digits = _getTables(tuple(size))
+    status = np.full(len(cells), OPEN, dtype=np.uint8)
+    placed = cells[:, :, None] == digits
+    unitCounts = placed[:, units].sum(axis=2)
+    broken = ((unitCounts > 1).any(axis=(1, 2)) |
+              (np.count_nonzero(cells, axis=1) < shape.minClues))
+    status[broken] = BROKEN
+    active = np.flatnonzero(~broken)
+
+    while active.size:
+        grids = cells[active]
+        empty = grids == 0
+        placed = grids[:, :, None] == digits
+        #  digits placed in each unit, then the candidates of the empty cells
+        unitCounts = placed[:, units].sum(axis=2)
+        candidates = ~(unitCounts[:, cellUnits] > 0).any(axis=2) & empty[:, :, None]
+        cellCounts = candidates.sum(axis=2)
+        unitPlaces = candidates[:, units].sum(axis=2)
+        dead = ((unitCounts > 1).any(axis=(1, 2)) |
+                (empty & (cellCounts == 0)).any(axis=1) |
+                ((unitCounts == 0) & (unitPlaces == 0)).any(axis=(1, 2)))
+        #  naked singles, then hidden singles : the only place of a digit in a unit
+        singles = candidates & ((cellCounts == 1)[:, :, None] |
+                                (unitPlaces == 1)[:, cellUnits].any(axis=2))
+        singleCounts = singles.sum(axis=2)
+        #  two digits forced in the same cell
+        dead |= (singleCounts > 1).any(axis=1)
+        moved = singleCounts.any(axis=1) & ~dead
+        solved = ~empty.any(axis=1) & ~dead
+
+        status[active[dead]] = DEAD
+        status[active[solved]] = DONE
+        grids = grids[moved]
+        forced = singleCounts[moved] == 1
+        grids[forced] = (singles[moved].argmax(axis=2) + 1)[forced]
+        active = active[moved]
+        cells[active] = grids
+    return status
+
+
+def solve_batch(grids, batchSize=BATCHSIZE, encoded=False, size=(3, 3), **options):
+    """ solve an iterable of grids, batchSize at a time, see module help """
+    size = tuple(size)
+    shape = SudokuShape.get(size)
+    options.setdefault("deepLevelMax", sudokuSolver.DEEPLEVELMAX)
+    options.setdefault("maxTime", sudokuSolver.MAXTIME)
+    solver = sudokuSolver(size=size, **options)
+    grids = iter(grids)
+    start = 0
+    while True:
+        batch = [grid if isinstance(grid, (bytes, bytearray)) else encode_grid(grid)
+                 for grid in islice(grids, batchSize)]
+        if not batch:
+            break
+        startTime = time.time()
+        cells = np.frombuffer(b"".join(batch), dtype=np.uint8).reshape(
+            len(batch), shape.cellCount).copy()
+        status = propagate_batch(cells, size)
+        share = (time.time() - startTime) / len(batch)
+        for offset, gridStatus in enumerate(status):
+            index = start + offset
+            if gridStatus == OPEN:
+                result = solver.solve(cells[offset].tobytes(), encoded)
+                yield result._replace(index=index, seconds=result.seconds + share)
+            elif gridStatus == DONE:
+                grid = cells[offset].tobytes()
+                yield SudokuResult(index, SOLVED, grid if encoded else decode_grid(grid),
+                                   0, share)
+            else:
+                yield SudokuResult(index, INVALID if gridStatus == BROKEN else UNSOLVABLE,
+                                   None, 0, share)
+        start += len(batch)
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from sudokuPuzzleFile import read_puzzles
+    from sudokuSolver import solve_many
+
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles")
+    grids = []
+    for name in sorted(os.listdir(folder)):
+        grids += read_puzzles(os.path.join(folder, name), encoded=True)
+    #  a given repeated in the first row
+    invalid = bytearray(grids[0])
+    invalid[invalid.index(0, 0, 9)] = next(Number for Number in invalid[:9] if Number)
+    grids.append(bytes(invalid))
+    grids *= 10
+
+    startTime = time.time()
+    serial = list(solve_many(grids, deepLevelMax=None, encoded=True))
+    serialTime = time.time() - startTime
+    startTime = time.time()
+    batch = list(solve_batch(grids, deepLevelMax=None, encoded=True))
+    batchTime = time.time() - startTime
+
+    cells = np.frombuffer(b"".join(grids), dtype=np.uint8).reshape(len(grids), 81).copy()
+    finished = np.count_nonzero(propagate_batch(cells) != OPEN)
+    print("sudokuBatch - {} grids : {:6.2f} seconds one by one, {:6.2f} seconds in batch, "
+          "{} finished by the vectorized singles".format(
+              len(grids), serialTime, batchTime, finished))
+
+    print("sudokuBatch - comparing batch and one by one results : ", end="")
+    if ([(r.index, r.status, r.grid) for r in serial] ==
+            [(r.index, r.status, r.grid) for r in batch]):
+        print("PASSED")
+    else:
+        print("FAILED")
+        sys.exit(1)
+
+    print("sudokuBatch - testing a 4x4 grid : ", end="")
+    result = next(solve_batch([[[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]],
+                              size=(2, 2)))
+    if result.status == SOLVED and result.grid == [[1, 3, 2, 4], [4, 2, 3, 1],
+                                                   [2, 4, 1, 3], [3, 1, 4, 2]]:
+        print("PASSED")
+    else:
+        print("FAILED", result)
+        sys.exit(1)
+    print("sudokuBatch - Testing completed, exiting")
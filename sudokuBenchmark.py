@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark sudokuSolver and AliAssafSudoku.solve_sudoku over the graded puzzle
+corpora of the "puzzles" folder (easy, medium, hard and 17clue).
+
+For every solver and corpus the benchmark reports the throughput (puzzles per
+second), the p50/p95/p99 latency of one puzzle, the peak memory allocated
+while solving the corpus (tracemalloc, measured in a separate pass so that
+it doesn't slow the timings) and the search nodes explored: guesses for
+sudokuSolver (nodeCount) and rows tried for the dancing links (nodes).
+
+Example:
+        $ python sudokuBenchmark.py
+        $ python sudokuBenchmark.py --solver ali --corpus hard 17clue --repeat 5
+        $ python sudokuBenchmark.py --json bench.json   # "-" for stdout
+
+    Functions:
+    load_corpus(name, limit=None)
+                   - returns the 81 bytes grids of puzzles/<name>.txt
+    run_benchmark(solvers=SOLVERS, corpora=CORPORA, repeat=REPEAT, limit=None, memory=True)
+                   - returns the benchmark report, a dictionary ready for json.dump()
+
+AliAssafSudoku.py is imported from the TensorFlow_yolov4_Tiny folder when
+it is not already importable.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+from sudokuSolver import sudokuSolver, SOLVED
+from sudokuPuzzleFile import read_puzzles
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PUZZLEDIR = os.path.join(HERE, "puzzles")
+CORPORA = ("easy", "medium", "hard", "17clue")
+SOLVERS = ("sudokuSolver", "ali")
+REPEAT = 3
+PERCENTILES = (50, 95, 99)
+
+
+def load_corpus(name, limit=None):
+    """ return the grids of a bundled corpus as 81 bytes """
+    path = os.path.join(PUZZLEDIR, name + ".txt")
+    return list(islice(read_puzzles(path, encoded=True), limit))
+
+
+def _importAli():
+    try:
+        import AliAssafSudoku
+    except ImportError:
+        sys.path.append(os.path.join(HERE, "TensorFlow_yolov4_Tiny"))
+        import AliAssafSudoku
+    return AliAssafSudoku
+
+
+def _runSudokuSolver(grids):
+    # yield (seconds, nodes, solved) per grid, with one reused solver.
+    # the limits are lifted, only the solving speed is measured
+    solver = sudokuSolver(deepLevelMax=None, maxTime=None)
+    clock = time.perf_counter
+    for grid in grids:
+        startTime = clock()
+        result = solver.solve(grid, encoded=True)
+        yield clock() - startTime, result.nodes, result.status == SOLVED
+
+
+def _runAli(grids):
+    # same as _runSudokuSolver() with the dancing links of AliAssafSudoku
+    links = _importAli().DancingLinks((3, 3))
+    clock = time.perf_counter
+    for grid in grids:
+        startTime = clock()
+        links.reset()
+        solved = False
+        try:
+            for cell, Number in enumerate(grid):
+                if Number:
+                    links.select((cell // 9, cell % 9, Number))
+            solved = next(links.solve(), None) is not None
+        except KeyError:
+            pass
+        yield clock() - startTime, links.nodes, solved
+
+
+RUNNERS = {
+    "sudokuSolver": _runSudokuSolver,
+    "ali": _runAli,
+    }
+
+
+def _percentile(values, percent):
+    # nearest rank percentile of sorted values
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[rank - 1]
+
+
+def _peakMemory(runner, grids):
+    # bytes allocated at the peak while solving all the grids
+    tracemalloc.start()
+    try:
+        #  start() begins a new peak, reset_peak() (python 3.9) covers
+        #  tracing already started with -X tracemalloc
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for _ in runner(grids):
+            pass
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def bench_corpus(solver, grids, repeat=REPEAT, memory=True):
+    """ return the measures of one solver over a list of grids """
+    runner = RUNNERS[solver]
+    latencies = []
+    nodes = []
+    solved = 0
+    totalTime = 0.0
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        for seconds, nodeCount, done in runner(grids):
+            latencies.append(seconds)
+            nodes.append(nodeCount)
+            solved += done
+        totalTime += time.perf_counter() - startTime
+    latencies.sort()
+    result = {
+        "puzzles": len(grids),
+        "solved": solved // repeat,
+        "seconds": totalTime / repeat,
+        "puzzlesPerSecond": len(latencies) / totalTime if totalTime else 0.0,
+        "latencyMs": dict(("p{}".format(percent),
+                           1000 * _percentile(latencies, percent))
+                          for percent in PERCENTILES),
+        "nodes": {"total": sum(nodes) // repeat,
+                  "mean": sum(nodes) / len(nodes),
+                  "max": max(nodes)},
+        "peakMemoryBytes": _peakMemory(runner, grids) if memory else None,
+        }
+    result["latencyMs"]["max"] = 1000 * latencies[-1]
+    return result
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"],
+                              cwd=HERE, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(solvers=SOLVERS, corpora=CORPORA, repeat=REPEAT, limit=None,
+                  memory=True):
+    """ run every solver over every corpus, see module help """
+    for solver in solvers:
+        if solver not in RUNNERS:
+            raise ValueError("sudokuBenchmark - unknown solver {}".format(solver))
+    report = {
+        "revision": _revision(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": [],
+        }
+    for corpus in corpora:
+        grids = load_corpus(corpus, limit)
+        if not grids:
+            continue
+        for solver in solvers:
+            result = {"solver": solver, "corpus": corpus}
+            result.update(bench_corpus(solver, grids, repeat, memory))
+            report["results"].append(result)
+    return report
+
+
+def print_report(report, stream=sys.stdout):
+    """ print the report as a table """
+    print("sudokuBenchmark - revision {} python {} {}".format(
+        report["revision"], report["implementation"], report["python"]), file=stream)
+    print("{:12} {:8} {:>7} {:>10} {:>8} {:>8} {:>8} {:>10} {:>10}".format(
+        "solver", "corpus", "solved", "puzzles/s", "p50 ms", "p95 ms", "p99 ms",
+        "nodes/puz", "peak KiB"), file=stream)
+    for result in report["results"]:
+        latency = result["latencyMs"]
+        peak = result["peakMemoryBytes"]
+        print("{:12} {:8} {:>7} {:10.1f} {:8.3f} {:8.3f} {:8.3f} {:10.1f} {:>10}".format(
+            result["solver"], result["corpus"],
+            "{}/{}".format(result["solved"], result["puzzles"]),
+            result["puzzlesPerSecond"], latency["p50"], latency["p95"], latency["p99"],
+            result["nodes"]["mean"], "-" if peak is None else "{:.1f}".format(peak / 1024)),
+            file=stream)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sudoku solvers benchmark")
+    parser.add_argument("--solver", nargs="+", choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument("--corpus", nargs="+", choices=CORPORA, default=list(CORPORA))
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help="timing passes over each corpus (default {})".format(REPEAT))
+    parser.add_argument("--limit", type=int, default=None,
+                        help="puzzles used from each corpus (default all)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the peak memory pass")
+    parser.add_argument("--json", metavar="FILE",
+                        help="write the report as JSON to FILE, '-' for stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.solver, args.corpus, args.repeat, args.limit, args.memory)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as stream:
+                json.dump(report, stream, indent=2)
+                stream.write("\n")
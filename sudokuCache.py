@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LRU cache of sudoku solutions keyed by a canonical form of the grid.
+
+Relabelling the digits, swapping bands or stacks, swapping rows inside a
+band or columns inside a stack and transposing the grid don't change a
+sudoku. canonical_form() moves a grid to a normal form under those
+transformations: rows, bands, columns and stacks are sorted by signatures
+that don't depend on the transformation (number of givens, then the givens
+of the crossing lines), the transposed grid is used when it comes first and
+the digits are renumbered in order of first appearance. The transformation
+is kept, so the cached solution of the normal form is mapped back to the
+grid asked.
+
+Two grids with the same key are always the same puzzle. Rows or columns
+with equal signatures keep their order, so some rare variants of a cached
+grid still get their own entry: a miss, never a wrong answer.
+
+Example:
+        from sudokuCache import SolutionCache
+        cache = SolutionCache(maxSize=256)
+        solution = cache.solve(grid)    # None when the solver found no solution
+        print(cache.info())             # {'hits': .., 'misses': .., 'size': .., 'maxSize': 256}
+
+    Args (SolutionCache):
+    solve          - optional - function(grid) returning the solution (list of rows)
+                     or None. The cache also remembers None, so a misread grid is not
+                     searched again. default = sudokuSolver.solve() without depth limit
+    maxSize(int)   - optional - number of grids kept, the least recently used one is
+                     dropped first. default = 1024
+    size(tuple)    - optional - (R, C) box size, see sudokuSolver. default = (3, 3)
+
+    Functions:
+    canonical_form(grid, size=(3, 3))
+                   - returns (key, transform): key is the normal form as bytes
+    restore_grid(data, transform, size=(3, 3))
+                   - returns the list of rows of a normal form grid (bytes) moved
+                     back through transform
+"""
+
+from collections import OrderedDict, namedtuple
+
+from sudokuSolver import sudokuSolver, SOLVED, decode_grid
+
+MAXSIZE = 1024
+
+#  rows and cols : original row (column) of each normal form row (column),
+#  digits : normal form digit of each original digit (index 0 is the empty place)
+Transform = namedtuple("Transform", "transposed rows cols digits")
+
+_MISSING = object()
+
+
+def _lineOrder(cells, N, R, C):
+    # order of the rows and of the columns of the grid
+    filled = [1 if Number else 0 for Number in cells]
+    rowCount = [sum(filled[row * N:row * N + N]) for row in range(N)]
+    colCount = [sum(filled[col::N]) for col in range(N)]
+    rowSignature = [(rowCount[row], sorted(count for count, isFilled in
+                                           zip(colCount, filled[row * N:row * N + N])
+                                           if isFilled))
+                    for row in range(N)]
+    colSignature = [(colCount[col], sorted(count for count, isFilled in
+                                           zip(rowCount, filled[col::N])
+                                           if isFilled))
+                    for col in range(N)]
+    return (_groupOrder(rowSignature, R, C), _groupOrder(colSignature, C, R))
+
+
+def _groupOrder(signature, lines, groups):
+    # sort the lines inside each group (band or stack) then the groups.
+    # python sorts are stable, equal signatures keep their order
+    ordered = [sorted(range(group * lines, group * lines + lines),
+                      key=signature.__getitem__, reverse=True)
+               for group in range(groups)]
+    ordered.sort(key=lambda group: [signature[line] for line in group], reverse=True)
+    return [line for group in ordered for line in group]
+
+
+def _normalForm(cells, N, R, C):
+    rows, cols = _lineOrder(cells, N, R, C)
+    moved = [cells[row * N + col] for row in rows for col in cols]
+    digits = [0] * (N + 1)
+    label = 0
+    for Number in moved:
+        if Number and not digits[Number]:
+            label += 1
+            digits[Number] = label
+    #  digits missing from the givens get the labels left, in order
+    for Number in range(1, N + 1):
+        if not digits[Number]:
+            label += 1
+            digits[Number] = label
+    return bytes(digits[Number] for Number in moved), rows, cols, digits
+
+
+def canonical_form(grid, size=(3, 3)):
+    """ return (key, transform) of a grid (list of rows or bytes), see module help """
+    R, C = size
+    N = R * C
+    if isinstance(grid, (bytes, bytearray)):
+        cells = list(grid)
+    else:
+        cells = [Number or 0 for row in grid for Number in row]
+    key, rows, cols, digits = _normalForm(cells, N, R, C)
+    transposed = False
+    if R == C:
+        flipped = [cells[col * N + row] for row in range(N) for col in range(N)]
+        flippedForm = _normalForm(flipped, N, R, C)
+        if flippedForm[0] < key:
+            key, rows, cols, digits = flippedForm
+            transposed = True
+    return key, Transform(transposed, rows, cols, digits)
+
+
+def restore_grid(data, transform, size=(3, 3)):
+    """ return the list of rows of a normal form grid moved back through transform """
+    N = size[0] * size[1]
+    original = [0] * (N + 1)
+    for Number, label in enumerate(transform.digits):
+        original[label] = Number
+    cells = [0] * (N * N)
+    for index, Number in enumerate(data):
+        row = transform.rows[index // N]
+        col = transform.cols[index % N]
+        if transform.transposed:
+            row, col = col, row
+        cells[row * N + col] = original[Number]
+    return [cells[row * N:row * N + N] for row in range(N)]
+
+
+class SolutionCache:
+    """ LRU cache of solutions in front of a solver, see module help """
+
+    def __init__(self, solve=None, maxSize=MAXSIZE, size=(3, 3)):
+        self.size = tuple(size)
+        if solve is None:
+            solver = sudokuSolver(deepLevelMax=None, size=self.size)
+
+            def solve(grid):
+                result = solver.solve(grid)
+                return result.grid if result.status == SOLVED else None
+        self._solve = solve
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, grid):
+        """ return the solution of grid (list of rows) or None """
+        key, transform = canonical_form(grid, self.size)
+        solution = self.entries.get(key, _MISSING)
+        if solution is _MISSING:
+            self.misses += 1
+            #  solve the normal form, its solution serves all the variants
+            solution = self._solve(decode_grid(key))
+            if solution is not None:
+                solution = bytes(Number for row in solution for Number in row)
+            self.entries[key] = solution
+            if len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        if solution is None:
+            return None
+        return restore_grid(solution, transform, self.size)
+
+    def info(self):
+        """ return the hit and miss counters and the number of grids kept """
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self.entries), "maxSize": self.maxSize}
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import sys
+    import time
+
+    from sudokuPuzzleFile import read_puzzles
+
+    def variant(grid, rnd):
+        # a random equivalent grid
+        digits = list(range(1, 10))
+        rnd.shuffle(digits)
+        bands = rnd.sample(range(3), 3)
+        stacks = rnd.sample(range(3), 3)
+        rows = [band * 3 + row for band in bands for row in rnd.sample(range(3), 3)]
+        cols = [stack * 3 + col for stack in stacks for col in rnd.sample(range(3), 3)]
+        moved = [[grid[row][col] and digits[grid[row][col] - 1] for col in cols]
+                 for row in rows]
+        if rnd.random() < 0.5:
+            moved = [list(col) for col in zip(*moved)]
+        return moved
+
+    rnd = random.Random(1)
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles")
+    grids = [decode_grid(grid) for grid in read_puzzles(os.path.join(folder, "hard.txt"),
+                                                       encoded=True)]
+    cache = SolutionCache()
+    for grid in grids:
+        cache.solve(grid)
+
+    print("sudokuCache - solving random variants of cached grids : ", end="")
+    startTime = time.time()
+    hits = cache.hits
+    failed = 0
+    count = 0
+    for grid in grids:
+        for _ in range(20):
+            puzzle = variant(grid, rnd)
+            solution = cache.solve(puzzle)
+            count += 1
+            if (solution is None or
+                    any(Number and Number != solution[row_i][col_i]
+                        for row_i, row in enumerate(puzzle)
+                        for col_i, Number in enumerate(row)) or
+                    sudokuSolver(solution).conflictCell is not None):
+                failed += 1
+    seconds = time.time() - startTime
+    if failed == 0:
+        print("PASSED")
+    else:
+        print("FAILED", failed)
+        sys.exit(1)
+    print("sudokuCache - {} of {} variants found in the cache, {:6.1f} microseconds per grid"
+          .format(cache.hits - hits, count, 1e6 * seconds / count))
+
+    print("sudokuCache - testing the LRU bound : ", end="")
+    small = SolutionCache(maxSize=4)
+    for grid in grids[:10]:
+        small.solve(grid)
+    small.solve(grids[9])
+    if small.info() == {"hits": 1, "misses": 10, "size": 4, "maxSize": 4}:
+        print("PASSED")
+    else:
+        print("FAILED", small.info())
+        sys.exit(1)
+    print("sudokuCache - Testing completed, exiting")
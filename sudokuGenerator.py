@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generate minimal sudoku puzzles with a unique solution, graded by the work
+sudokuSolver needs to solve them.
+
+A random solution grid is made by sudokuSolver (random guesses) from a few
+random independent boxes. Its cells are then emptied in a random order,
+each one staying empty only if the grid still has a single solution
+(sudokuSolver.countSolutions), so no given of the puzzle can be removed.
+
+The grades are the ones of the bundled corpora (puzzles folder):
+    "easy"   - solved with naked and hidden singles only
+    "medium" - solved without guessing, using the propagation techniques
+    "hard"   - sudokuSolver needs at least one guess
+
+Example:
+        from sudokuGenerator import generate_puzzles
+        from sudokuPuzzleFile import write_puzzles
+        puzzles = generate_puzzles(1000, grades=("hard",), seed=1)
+        write_puzzles("hard.txt", (puzzle for puzzle, grade in puzzles))
+
+    Functions:
+    generate_puzzles(count, grades=None, processes=None, seed=0, size=(3, 3), symmetric=False)
+                   - yields count (puzzle, grade) pairs, puzzles as bytes (encode_grid()).
+                     grades limits the grades kept, processes is the number of worker
+                     processes (default number of cpu, 1 runs in this process and is
+                     reproducible for a seed). symmetric keeps the givens symmetric
+                     around the center
+    generate_puzzle(seed=None, size=(3, 3), symmetric=False)
+                   - returns one (puzzle, grade) pair
+    random_solution(rnd, size=(3, 3))
+                   - returns a random solved grid as bytes, rnd is a random.Random
+    make_puzzle(solution, rnd, size=(3, 3), symmetric=False)
+                   - returns a minimal unique puzzle of a solved grid
+    grade_puzzle(puzzle, size=(3, 3))
+                   - returns the grade of a puzzle and the sudokuSolver SudokuStats
+
+Used as a command, writes a puzzle file:
+        $ python sudokuGenerator.py 500 puzzles.txt --grade medium hard --processes 4
+"""
+
+import multiprocessing
+import os
+import queue
+import random
+
+from sudokuSolver import sudokuSolver, SudokuShape, SOLVED
+
+GRADES = ("easy", "medium", "hard")
+CHUNKSIZE = 4            # puzzles made by a worker at once
+CHUNKS_PER_PROCESS = 2   # chunks in flight for each worker process
+
+
+def random_solution(rnd, size=(3, 3)):
+    """ return a random solved grid as bytes """
+    shape = SudokuShape.get(size)
+    R, C = shape.size
+    N = shape.N
+    cells = bytearray(shape.cellCount)
+    #  boxes on the diagonal share no row or column, any digits fit
+    for band in range(min(R, C)):
+        box = shape.units[2 * N + band * R + band]
+        for cell, Number in zip(box, rnd.sample(range(1, N + 1), N)):
+            cells[cell] = Number
+    solver = sudokuSolver(deepLevelMax=None, tieBreak="random",
+                          seed=rnd.random(), size=size)
+    result = solver.solve(bytes(cells), encoded=True)
+    if result.status != SOLVED:
+        raise RuntimeError("sudokuGenerator - no solution grid found : {}".format(result.status))
+    return result.grid
+
+
+def make_puzzle(solution, rnd, size=(3, 3), symmetric=False):
+    """ return a minimal puzzle (bytes) whose only solution is solution """
+    shape = SudokuShape.get(size)
+    solver = sudokuSolver(bytes(solution), deepLevelMax=None, size=size)
+    N = shape.N
+    order = list(range(shape.cellCount))
+    rnd.shuffle(order)
+    for cell in order:
+        #  with symmetric, the cell and its mirror around the center go together
+        cells = {cell, shape.cellCount - 1 - cell} if symmetric else {cell}
+        if not solver.cells[cell]:
+            continue
+        for place in cells:
+            solver.setCell(place // N, place % N, 0)
+        if solver.countSolutions(2) != 1:
+            for place in cells:
+                solver.setCell(place // N, place % N, solution[place])
+    return bytes(solver.cells)
+
+
+def grade_puzzle(puzzle, size=(3, 3)):
+    """ return (grade, stats) of a puzzle, see module help """
+    solver = sudokuSolver(deepLevelMax=None, stats=True, size=size)
+    result = solver.solve(puzzle)
+    if result.status != SOLVED:
+        raise ValueError("sudokuGenerator - puzzle not solved : {}".format(result.status))
+    stats = solver.stats
+    if stats.guesses:
+        return "hard", stats
+    if stats.techniques:
+        return "medium", stats
+    return "easy", stats
+
+
+def generate_puzzle(seed=None, size=(3, 3), symmetric=False):
+    """ return one (puzzle, grade) pair """
+    rnd = random.Random(seed)
+    puzzle = make_puzzle(random_solution(rnd, size), rnd, size, symmetric)
+    return puzzle, grade_puzzle(puzzle, size)[0]
+
+
+def _generateChunk(seeds, size, symmetric):
+    # worker side
+    return [generate_puzzle(seed, size, symmetric) for seed in seeds]
+
+
+def generate_puzzles(count, grades=None, processes=None, seed=0, size=(3, 3),
+                     symmetric=False):
+    """ yield count (puzzle, grade) pairs, see module help """
+    if grades is not None:
+        for grade in grades:
+            if grade not in GRADES:
+                raise ValueError("sudokuGenerator - unknown grade {}".format(grade))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    #  puzzle seeds follow each other from seed, one chunk of them per task
+    rnd = random.Random(seed)
+    found = 0
+
+    def keep(pairs):
+        nonlocal found
+        for puzzle, grade in pairs:
+            if found < count and (grades is None or grade in grades):
+                found += 1
+                yield puzzle, grade
+
+    if processes == 1:
+        while found < count:
+            yield from keep([generate_puzzle(rnd.random(), size, symmetric)])
+        return
+
+    finished = queue.Queue()
+    inFlight = 0
+    with multiprocessing.Pool(processes) as pool:
+        while found < count:
+            while inFlight < processes * CHUNKS_PER_PROCESS:
+                seeds = [rnd.random() for _ in range(CHUNKSIZE)]
+                pool.apply_async(_generateChunk, (seeds, size, symmetric),
+                                 callback=finished.put, error_callback=finished.put)
+                inFlight += 1
+            done = finished.get()
+            inFlight -= 1
+            if isinstance(done, BaseException):
+                raise done
+            yield from keep(done)
+        #  leaving the pool terminates the chunks still running
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    from sudokuPuzzleFile import write_puzzles
+
+    parser = argparse.ArgumentParser(description="sudoku puzzles generator")
+    parser.add_argument("count", type=int, nargs="?",
+                        help="number of puzzles, the self-test is run without it")
+    parser.add_argument("output", nargs="?", help="puzzle file written")
+    parser.add_argument("--grade", nargs="+", choices=GRADES, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--symmetric", action="store_true")
+    args = parser.parse_args()
+
+    if args.count is not None:
+        if args.output is None:
+            parser.error("the puzzle file is missing")
+        tally = {}
+
+        def counted(pairs):
+            for puzzle, grade in pairs:
+                tally[grade] = tally.get(grade, 0) + 1
+                yield puzzle
+
+        startTime = time.time()
+        written = write_puzzles(args.output, counted(generate_puzzles(
+            args.count, args.grade, args.processes, args.seed, symmetric=args.symmetric)))
+        print("sudokuGenerator - {} puzzles in {:6.2f} seconds {}".format(
+            written, time.time() - startTime, tally))
+        sys.exit()
+
+    print("sudokuGenerator - testing unique and minimal generated puzzles : ", end="")
+    ok = True
+    for puzzle, grade in generate_puzzles(3, processes=1, seed=1):
+        solver = sudokuSolver(puzzle, deepLevelMax=None)
+        ok = ok and solver.countSolutions(2) == 1
+        for cell in range(81):
+            Number = puzzle[cell]
+            if Number:
+                solver.setCell(cell // 9, cell % 9, 0)
+                ok = ok and solver.countSolutions(2) == 2
+                solver.setCell(cell // 9, cell % 9, Number)
+    if ok:
+        print("PASSED")
+    else:
+        print("FAILED")
+        sys.exit(1)
+
+    print("sudokuGenerator - testing symmetric puzzles : ", end="")
+    puzzle, grade = generate_puzzle(seed=2, symmetric=True)
+    if all(bool(puzzle[cell]) == bool(puzzle[80 - cell]) for cell in range(81)):
+        print("PASSED")
+    else:
+        print("FAILED")
+        sys.exit(1)
+
+    print("sudokuGenerator - testing the grade filter with 2 processes : ", end="")
+    pairs = list(generate_puzzles(4, grades=("medium", "hard"), processes=2, seed=3))
+    if len(pairs) == 4 and all(grade_puzzle(puzzle)[0] == grade != "easy"
+                               for puzzle, grade in pairs):
+        print("PASSED")
+    else:
+        print("FAILED", pairs)
+        sys.exit(1)
+    print("sudokuGenerator - Testing completed, exiting")
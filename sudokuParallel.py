@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Solve large batches of sudoku grids on all the cores of the machine.
+
+The grids are grouped in chunks and sent to a pool of worker processes as
+81 bytes per grid (see sudokuSolver.encode_grid), instead of pickled lists
+of rows. Only a few chunks per worker are in flight at any time, so the
+input can be a generator over a file much bigger than the memory.
+
+Example:
+        from sudokuParallel import solve_parallel
+        for result in solve_parallel(my_grids(), chunkSize=500):
+            print(result.index, result.status)
+            if result.status == "solved":
+                sudoku.printGrid(result.grid)
+
+    Args (solve_parallel):
+    grids          - iterable of grids (lists of rows or encode_grid() bytes)
+    processes(int) - optional - number of worker processes. default = number of cpu
+    chunkSize(int) - optional - number of grids sent to a worker at once. default = 256
+    ordered(bool)  - optional - yield the results in the input order. default = True
+                     When False results are yielded as soon as a chunk is done.
+    solver(str)    - optional - "sudokuSolver" (default) or "ali" for
+                     AliAssafSudoku.solve_sudoku (AliAssafSudoku.py, in the
+                     TensorFlow_yolov4_Tiny folder, must be importable)
+    encoded(bool)  - optional - yield the solved grids as 81 bytes. default = False
+    other keyword arguments are passed to sudokuSolver.solve_many(), size=(R, C)
+    is used by both solvers for grids other than 9x9
+
+    Yields sudokuSolver.SudokuResult(index, status, grid, deepestLevel, seconds,
+    nodes, steps, partial) for every grid. The AliAssafSudoku solver reports
+    deepestLevel, nodes and steps as 0.
+
+    A self-test comparing the parallel and serial results is run with:
+        $ python sudokuParallel.py
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+
+from sudokuSolver import (SudokuResult, SOLVED, INVALID, UNSOLVABLE,
+                          encode_grid, decode_grid, solve_many)
+
+CHUNKSIZE = 256
+CHUNKS_PER_PROCESS = 4  # chunks in flight for each worker process
+SOLVERS = ("sudokuSolver", "ali")
+
+
+def _encodeChunks(grids, chunkSize):
+    # yield (index of first grid, grids encoded back to back)
+    chunk = bytearray()
+    start = 0
+    count = 0
+    for grid in grids:
+        if isinstance(grid, (bytes, bytearray)):
+            chunk += grid
+        else:
+            chunk += encode_grid(grid)
+        count += 1
+        if count == chunkSize:
+            yield start, bytes(chunk)
+            start += count
+            chunk = bytearray()
+            count = 0
+    if count:
+        yield start, bytes(chunk)
+
+
+def _solveAli(grids, size):
+    # same results as solve_many() using Ali Assaf's Algorithm X solver
+    from AliAssafSudoku import solve_sudoku
+
+    for index, data in enumerate(grids):
+        startTime = time.time()
+        grid = decode_grid(data)
+        try:
+            solution = next(solve_sudoku(size, grid), None)
+        except KeyError:
+            #  a given digit is repeated in a row, column or box
+            yield SudokuResult(index, INVALID, None, 0, time.time() - startTime)
+            continue
+        if solution is None:
+            yield SudokuResult(index, UNSOLVABLE, None, 0, time.time() - startTime)
+        else:
+            yield SudokuResult(index, SOLVED, encode_grid(solution), 0,
+                               time.time() - startTime)
+
+
+def _solveChunk(start, chunk, solver, options):
+    # worker side. return (start, results) with the solved grids encoded
+    size = options.get("size", (3, 3))
+    cellCount = (size[0] * size[1]) ** 2
+    grids = [chunk[offset:offset + cellCount] for offset in range(0, len(chunk), cellCount)]
+    if solver == "ali":
+        results = _solveAli(grids, tuple(size))
+    else:
+        results = solve_many(grids, encoded=True, **options)
+    return start, [result._replace(index=start + result.index) for result in results]
+
+
+def solve_parallel(grids, processes=None, chunkSize=CHUNKSIZE, ordered=True,
+                   solver="sudokuSolver", encoded=False, **options):
+    """ solve an iterable of grids with a pool of processes, see module help """
+    if solver not in SOLVERS:
+        raise ValueError("sudokuParallel - unknown solver {}".format(solver))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    maxInFlight = processes * CHUNKS_PER_PROCESS
+    finished = queue.Queue()
+    chunks = _encodeChunks(grids, chunkSize)
+    exhausted = False
+    inFlight = 0
+    nextStart = 0
+    waiting = {}
+
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            while not exhausted and inFlight < maxInFlight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                pool.apply_async(_solveChunk, chunk + (solver, options),
+                                 callback=finished.put, error_callback=finished.put)
+                inFlight += 1
+            if inFlight == 0:
+                break
+            done = finished.get()
+            inFlight -= 1
+            if isinstance(done, BaseException):
+                raise done
+            if ordered:
+                #  keep chunks finished too early until their turn
+                waiting[done[0]] = done[1]
+                while nextStart in waiting:
+                    results = waiting.pop(nextStart)
+                    nextStart += len(results)
+                    for result in results:
+                        yield _export(result, encoded)
+            else:
+                for result in done[1]:
+                    yield _export(result, encoded)
+
+
+def _export(result, encoded):
+    if encoded:
+        return result
+    if result.grid is not None:
+        result = result._replace(grid=decode_grid(result.grid))
+    if result.partial is not None:
+        result = result._replace(partial=decode_grid(result.partial))
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    hard_grids = [
+        "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+        "52...6.........7.13...........4..8..6......5...........418.........3..2...87.....",
+        "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....",
+        "48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....",
+        "....14....3....2...7..........9...3.6.1.............8.2.....1.4....5.6.....7.8...",
+        "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..",
+        ]
+    grids = [bytes(0 if ch == "." else int(ch) for ch in line) for line in hard_grids] * 20
+
+    startTime = time.time()
+    serial = list(solve_many(grids))
+    serialTime = time.time() - startTime
+    print("sudokuParallel - {} grids solved serially in {:6.2f} seconds".format(
+        len(grids), serialTime))
+
+    startTime = time.time()
+    parallel = list(solve_parallel(grids, chunkSize=16))
+    parallelTime = time.time() - startTime
+    print("sudokuParallel - {} grids solved on {} processes in {:6.2f} seconds".format(
+        len(grids), os.cpu_count(), parallelTime))
+
+    print("sudokuParallel - comparing parallel and serial results : ", end="")
+    if ([(r.index, r.status, r.grid) for r in serial] ==
+            [(r.index, r.status, r.grid) for r in parallel]):
+        print("PASSED")
+    else:
+        print("FAILED")
+        sys.exit(1)
+
+    print("sudokuParallel - testing unordered results : ", end="")
+    unordered = solve_parallel(grids, chunkSize=16, ordered=False, encoded=True)
+    if sorted(r.index for r in unordered) == list(range(len(grids))):
+        print("PASSED")
+    else:
+        print("FAILED")
+        sys.exit(1)
+    print("sudokuParallel - Testing completed, exiting")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read and write sudoku puzzle files in the usual one line per puzzle format:
+81 characters in row-major order, "1"-"9" for the digits and "." or "0" for
+the empty places. Anything after the 81 characters (rating, solution, ...)
+is ignored. Empty lines and lines starting with "#" are skipped.
+
+The files are read in large binary blocks and the puzzles are yielded one
+at a time, so multi-gigabyte corpora never need to fit in memory. Files
+ending with ".gz" are decompressed on the fly.
+
+Example:
+        from sudokuPuzzleFile import read_puzzles, write_puzzles
+        from sudokuSolver import solve_many
+        results = solve_many(read_puzzles("puzzles.txt", encoded=True), encoded=True)
+        write_puzzles("solutions.txt", (result.grid for result in results))
+
+    Functions:
+    read_puzzles(source, encoded=False, bufferSize=BUFFERSIZE)
+                   - yields the grids of a file name or binary file object, as lists
+                     of rows or, with encoded=True, as 81 bytes (sudokuSolver.encode_grid)
+                     Raises ValueError on a malformed line.
+    write_puzzles(destination, grids, blank=".")
+                   - writes grids (lists of rows or 81 bytes, None for an unsolved
+                     grid, written as 81 blanks) to a file name or binary file object.
+                     Returns the number of grids written.
+    line_to_grid() - returns the 81 bytes encoding of one puzzle line
+    grid_to_line() - returns the puzzle line of one grid, without end of line
+
+Used as a command, solves a puzzle file into a solution file:
+        $ python sudokuPuzzleFile.py puzzles.txt solutions.txt [processes]
+"""
+
+import gzip
+
+from sudokuSolver import encode_grid, decode_grid
+
+BUFFERSIZE = 1 << 20  # bytes read at once
+WRITEBATCH = 4096     # lines written at once
+
+#  puzzle characters to cell values, anything else is marked 0xFF
+_INPUT_TABLE = bytearray(b"\xff" * 256)
+for _digit in range(10):
+    _INPUT_TABLE[ord("0") + _digit] = _digit
+_INPUT_TABLE[ord(".")] = 0
+_INPUT_TABLE = bytes(_INPUT_TABLE)
+
+
+def _outputTable(blank):
+    table = bytearray(range(256))
+    table[0] = ord(blank)
+    for digit in range(1, 10):
+        table[digit] = ord("0") + digit
+    return bytes(table)
+
+
+def _open(source, mode):
+    if hasattr(source, "read" if mode == "rb" else "write"):
+        return source, False
+    if str(source).endswith(".gz"):
+        return gzip.open(source, mode), True
+    return open(source, mode), True
+
+
+def line_to_grid(line, lineNumber=None):
+    """ return the 81 bytes encoding of a puzzle line (bytes or str) """
+    if isinstance(line, str):
+        line = line.encode("ascii", "replace")
+    grid = line[:81].translate(_INPUT_TABLE)
+    if len(grid) != 81 or 0xFF in grid:
+        where = "" if lineNumber is None else " at line {}".format(lineNumber)
+        raise ValueError("sudokuPuzzleFile - invalid puzzle{} : {!r}".format(
+            where, line[:81]))
+    return grid
+
+
+def grid_to_line(grid, blank="."):
+    """ return the 81 characters line of a grid (list of rows or 81 bytes) """
+    if not isinstance(grid, (bytes, bytearray)):
+        grid = encode_grid(grid)
+    return bytes(grid).translate(_outputTable(blank)).decode("ascii")
+
+
+def read_puzzles(source, encoded=False, bufferSize=BUFFERSIZE):
+    """ yield the grids of a puzzle file, see module help """
+    stream, mustClose = _open(source, "rb")
+    try:
+        rest = b""
+        lineNumber = 0
+        while True:
+            block = stream.read(bufferSize)
+            if isinstance(block, str):
+                block = block.encode("ascii", "replace")
+            if not block:
+                lines = [rest] if rest else []
+            else:
+                lines = (rest + block).split(b"\n")
+                #  the last line may continue in the next block
+                rest = lines.pop()
+            for line in lines:
+                lineNumber += 1
+                line = line.strip()
+                if not line or line.startswith(b"#"):
+                    continue
+                grid = line_to_grid(line, lineNumber)
+                yield grid if encoded else decode_grid(grid)
+            if not block:
+                break
+    finally:
+        if mustClose:
+            stream.close()
+
+
+def write_puzzles(destination, grids, blank="."):
+    """ write grids in a puzzle file, one per line, see module help """
+    table = _outputTable(blank)
+    unsolved = bytes(81).translate(table)
+    stream, mustClose = _open(destination, "wb")
+    count = 0
+    lines = []
+    try:
+        for grid in grids:
+            if grid is None:
+                lines.append(unsolved)
+            else:
+                if not isinstance(grid, (bytes, bytearray)):
+                    grid = encode_grid(grid)
+                lines.append(bytes(grid).translate(table))
+            count += 1
+            if len(lines) == WRITEBATCH:
+                stream.write(b"\n".join(lines) + b"\n")
+                lines = []
+        if lines:
+            stream.write(b"\n".join(lines) + b"\n")
+    finally:
+        if mustClose:
+            stream.close()
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 3:
+        print("usage: python sudokuPuzzleFile.py puzzles.txt solutions.txt [processes]")
+        sys.exit(1)
+
+    status = {}
+
+    def solutions(results):
+        for result in results:
+            status[result.status] = status.get(result.status, 0) + 1
+            yield result.grid
+
+    startTime = time.time()
+    puzzles = read_puzzles(sys.argv[1], encoded=True)
+    if len(sys.argv) > 3:
+        from sudokuParallel import solve_parallel
+        results = solve_parallel(puzzles, processes=int(sys.argv[3]), encoded=True)
+    else:
+        from sudokuSolver import solve_many
+        results = solve_many(puzzles, encoded=True)
+    count = write_puzzles(sys.argv[2], solutions(results))
+    print("sudokuPuzzleFile - {} puzzles in {:6.2f} seconds {}".format(
+        count, time.time() - startTime, status))
@@ -25,33 +25,91 @@ and use sudokuSolver to resolve. Example follows:
 
     Args:
     deeplevel(int): optional - deepest recursion level used to solve sudoku grid
-                    default = 5
+                    default = 5, None for no limit
                     sudokuSolver raises SudokuDeepLevelError exception if exceeded
     maxtime(float): optional - maximum time in seconds allowed to solve sudoku grid
-                    default = 15
+                    default = 15, None for no limit. The clock is read every LIMITCHECK
+                    propagation steps, so a deep search can't run far past it
                     sudokuSolver raises SudokuTimeLimitError exception if exceeded
+    maxNodes(int):  optional - maximum number of guesses tried. default = None (no limit)
+    maxSteps(int):  optional - maximum number of propagation steps (one naked or hidden
+                    single search each). default = None (no limit)
+                    These budgets don't depend on the machine load, the same grid always
+                    stops at the same point. sudokuSolver raises SudokuBudgetError if exceeded
+    tieBreak(str):  optional - guesses are made on the empty cell with the fewest
+                    candidates. tieBreak chooses between cells with the same count:
+                    "first" (row-major order, default), "degree" (most empty cells
+                    in its row, column and box) or "random"
+    seed:           optional - seed of the random generator used by tieBreak="random"
+    propagation:    optional - techniques used to remove candidates when no naked or hidden
+                    single is left, before guessing. Names from TECHNIQUES ("pointing",
+                    "boxLine", "nakedPairs", "hiddenPairs", "nakedTriples", "hiddenTriples")
+                    or functions taking the solver and returning True when they removed
+                    candidates with solver._eliminate(). default = all of them
+    size(tuple):    optional - (R, C) box of R rows and C columns, the grid has N = R * C
+                    rows, columns, boxes and digits: (2, 2) for 4x4, (2, 3) for 6x6,
+                    (4, 4) for 16x16, (5, 5) for 25x25... default = (3, 3)
+    stats:          optional - True to collect search statistics in the "stats" attribute,
+                    a new SudokuStats, or a SudokuStats to add them to (solve_many(grids,
+                    stats=my_stats) for instance). default = False, the solver then
+                    runs uninstrumented
 
     Attributes:
     grid          - list of numbers for sudoku grid arranged as:
                     [[row 1],[row 2], ... [row 9]] where each row is a list of nine digits
+                    (N rows of N numbers for other sizes)
                     with zeroes ("0") used to mark empty sudoku grid places.
                     ex: a row like "8 _ 1 _ _ 3 _ _ 1" would be the list : [8,0,1,0,0,3,0,0,1]
+                    The solver works on an internal flat copy (attribute "cells"), so
+                    "grid" is an import/export view: assigning it loads a new grid and
+                    reading it returns a new list. Use setCell() to change one cell.
+    deepestLevel  - deepest guess level reached by the last solveGrid()
+    nodeCount     - number of guesses tried by the last solveGrid() or countSolutions()
+    stats         - SudokuStats accumulated over all the solves with stats=True, else None:
+                    nakedSingles, hiddenSingles, techniques (successful passes by name),
+                    guesses, backtracks, deadEnds, nodes (grids searched), solves and
+                    validationTime, propagationTime, searchTime in seconds.
+                    stats.reset() clears it, stats.asDict() returns a plain dictionary
 
     Methods:
     isValid()     - validates internal attribute "grid". Returns True/False accordingly
+                    The validation state is updated on each placement, so this is a
+                    simple query. Use setCell() to change a cell of a loaded grid.
+    countSolutions(limit=2)
+                  - returns the number of solutions of the loaded grid, up to limit
+    setCell()     - places a number (0 to clear) at row, col and updates the validation state
     printGrid()   - prints internal attribute "grid" by default.
                     If provided a user grid-like argument, will print that user grid. In that
                     case the user passed grid must be a list structured like the "grid" attribute.
     solveGrid()   - initiates the sudoku grid solving process. By default uses the internal
                     attribute "grid".  Will solve user provided grid if one is passed as argument.
                     In that case, user passed grid must be a list structured like "grid" attribute.
-                    Raises SudokuDeepLevelError or SudokuTimeLimitError if internal limits exceeded.
+                    Raises SudokuDeepLevelError, SudokuTimeLimitError or SudokuBudgetError if
+                    internal limits exceeded.
+    solve(grid=None, encoded=False)
+                  - same as solveGrid() but never raises, returns a SudokuResult instead.
+                    When a limit stops the search, result.partial is the grid of the
+                    cells deduced before the first guess (all certain)
+
+    Functions:
+    solve_many()  - solves an iterable of grids with one reused solver, yielding a
+                    SudokuResult(index, status, grid, deepestLevel, seconds, nodes, steps,
+                    partial) per grid, see solve(). status is SOLVED, INVALID, UNSOLVABLE,
+                    DEEPLEVEL, TIMEOUT or BUDGET and nothing is raised.
+    count_solutions(grid, limit=2)
+                  - returns the number of solutions of grid, counting stops at limit.
+                    count_solutions(grid) == 1 checks that a grid has a unique solution
+    encode_grid() - returns a grid as 81 bytes (one digit value per cell, N * N bytes for
+                    other sizes). The grid attribute and solve_many() also accept this encoding
+    decode_grid() - returns the list of rows of an encoded grid
 
     Exceptions:
     SudokuDeepLevelError   - exception raised if solving process uses recursion than specified.
                              see Args section above
     SudokuTimeLimitError   - exception raised if solving process uses more time than allocated.
                              see Args section above
+    SudokuBudgetError      - exception raised if solving process tries more guesses or steps
+                             than allowed. see Args section above
 
 Created on Tue Aug 18 21:05:13 2020
 @author: daniel
@@ -84,7 +142,100 @@ Class to solve sudoku grid
 
 
 import copy
+import random
 import time
+from collections import namedtuple
+from itertools import combinations
+
+#  candidate engine : digits are kept as N-bit masks (bit n-1 set for digit n).
+#  Up to TABLEBITS digits, the digits and the count of every mask are tabulated
+TABLEBITS = 16
+#  fewest givens of a grid with a unique solution, by box size. N - 1 otherwise
+MIN_CLUES = {(2, 2): 4, (2, 3): 8, (3, 2): 8, (3, 3): 17}
+
+
+class _MaskDigits:
+    # SudokuShape.bitDigits for masks too wide to tabulate, mask -> list of digits
+    def __getitem__(self, mask):
+        digits = []
+        while mask:
+            low = mask & -mask
+            digits.append(low.bit_length())
+            mask ^= low
+        return digits
+
+
+class _MaskCount:
+    # SudokuShape.bitCount for masks too wide to tabulate, mask -> number of digits
+    def __getitem__(self, mask):
+        return bin(mask).count("1")
+
+
+class SudokuShape:
+    """ tables of one grid shape : boxes of R rows and C columns, N = R * C digits.
+
+        cell = row * N + col. Units 0 to N-1 are the rows, N to 2N-1 the
+        columns and 2N to 3N-1 the boxes. The tables of each size are built
+        once and cached in SudokuShape.shapes, see SudokuShape.get()
+    """
+
+    shapes = {}
+
+    @staticmethod
+    def get(size=(3, 3)):
+        size = tuple(size)
+        shape = SudokuShape.shapes.get(size)
+        if shape is None:
+            shape = SudokuShape.shapes[size] = SudokuShape(size)
+        return shape
+
+    def __init__(self, size):
+        R, C = size
+        N = R * C
+        if R < 1 or C < 1 or N > 255:
+            raise ValueError("sudokuSolver - unsupported box size {}".format(size))
+        self.size = (R, C)
+        self.N = N
+        self.cellCount = N * N
+        self.allBits = (1 << N) - 1
+        if N <= TABLEBITS:
+            self.bitDigits = [[n + 1 for n in range(N) if (mask >> n) & 1]
+                              for mask in range(self.allBits + 1)]
+            self.bitCount = [len(digits) for digits in self.bitDigits]
+        else:
+            self.bitDigits = _MaskDigits()
+            self.bitCount = _MaskCount()
+        cells = range(N * N)
+        self.cellRow = bytes(cell // N for cell in cells)
+        self.cellCol = bytes(cell % N for cell in cells)
+        self.cellBox = bytes((cell // N // R) * R + (cell % N) // C for cell in cells)
+        self.cellUnits = [(self.cellRow[cell], N + self.cellCol[cell], 2 * N + self.cellBox[cell])
+                          for cell in cells]
+        self.units = [[] for unit in range(3 * N)]
+        for cell, cellUnits in enumerate(self.cellUnits):
+            for unit in cellUnits:
+                self.units[unit].append(cell)
+        self.peers = [sorted(set(self.units[row_u] + self.units[col_u] + self.units[box_u]) - {cell})
+                      for cell, (row_u, col_u, box_u) in enumerate(self.cellUnits)]
+        #  hidden singles are searched in the boxes first, then rows and columns
+        self.uniquePositionOrder = list(range(2 * N, 3 * N)) + list(range(2 * N))
+        self.minClues = MIN_CLUES.get(self.size, N - 1)
+
+
+#  status of a SudokuResult
+SOLVED = "solved"
+INVALID = "invalid"
+UNSOLVABLE = "unsolvable"
+DEEPLEVEL = "deeplevel"
+TIMEOUT = "timeout"
+BUDGET = "budget"
+
+#  one puzzle result from solve() and solve_many(). grid is None unless status is
+#  SOLVED, partial is the grid deduced before the first guess when a limit stopped
+#  the search (DEEPLEVEL, TIMEOUT or BUDGET), else None
+SudokuResult = namedtuple("SudokuResult",
+                          "index status grid deepestLevel seconds nodes steps partial",
+                          defaults=(0, 0, None))
 
 class SudokuDeepLevelError(Exception):
     """Exception when SudokuSolver exceeds DEEPLEVELMAX number of recursions"""
@@ -102,350 +253,705 @@ class SudokuTimeLimitError(Exception):
     def __str__(self):
         return repr(self.msg_tle)
 
+class SudokuBudgetError(Exception):
+    """Exception when SudokuSolver exceeds its maxNodes or maxSteps budget"""
+    def __init__(self, budget, limit):
+        Exception.__init__(self)
+        self.msg_sbe = "SudokuSolver - requires more than {} {}".format(limit, budget)
+    def __str__(self):
+        return repr(self.msg_sbe)
+
+class SudokuStats:
+    """Search statistics of a sudokuSolver created with stats=True"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.solves = 0
+        self.nakedSingles = 0
+        self.hiddenSingles = 0
+        self.techniques = {}
+        self.guesses = 0
+        self.backtracks = 0
+        self.deadEnds = 0
+        self.nodes = 0
+        self.validationTime = 0.0
+        self.propagationTime = 0.0
+        self.searchTime = 0.0
+
+    def asDict(self):
+        stats = dict(vars(self))
+        stats["techniques"] = dict(self.techniques)
+        return stats
+
+    def __str__(self):
+        return "SudokuStats({})".format(", ".join(
+            "{}={}".format(name, value) for name, value in self.asDict().items()))
+
 class sudokuSolver:
 
     DEEPLEVELMAX = 5  #maximum level of recursive analysis
     MAXTIME = 15       #maximum time (in seconds) allowed
+    LIMITCHECK = 4     #propagation steps between two clock readings
+    TIEBREAK = "first" #how to choose between cells with the same number of candidates
+    #propagation techniques tried in order when no single is left, see TECHNIQUES
+    PROPAGATION = ("pointing", "boxLine", "nakedPairs", "hiddenPairs",
+                   "nakedTriples", "hiddenTriples")
 
-    def __init__(self, grid=None,deepLevelMax=DEEPLEVELMAX, maxTime=MAXTIME):
-        if grid is None:
-            self.grid = [x[:] for x in [[0] * 9]*9]
-        else:
-            self.grid = copy.deepcopy(grid)
-        self.allNumbers = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+    def __init__(self, grid=None,deepLevelMax=DEEPLEVELMAX, maxTime=MAXTIME,
+                 tieBreak=TIEBREAK, seed=None, propagation=PROPAGATION, stats=False,
+                 maxNodes=None, maxSteps=None, size=(3, 3)):
+        if tieBreak not in ("first", "degree", "random"):
+            raise ValueError("sudokuSolver - unknown tieBreak {}".format(tieBreak))
+#        a technique is a name from TECHNIQUES or a function(solver) returning
+#        True when it removed candidates (using solver._eliminate())
+        self.techniques = []
+        for technique in propagation:
+            if not callable(technique):
+                if technique not in TECHNIQUES:
+                    raise ValueError("sudokuSolver - unknown technique {}".format(technique))
+                technique = TECHNIQUES[technique]
+            self.techniques.append(technique)
+#        tables of the grid shape, see SudokuShape
+        shape = self.shape = SudokuShape.get(size)
+        self.N = shape.N
+        self.cellCount = shape.cellCount
+        self.allBits = shape.allBits
+        self.bitDigits = shape.bitDigits
+        self.bitCount = shape.bitCount
+        self.cellUnits = shape.cellUnits
+        self.units = shape.units
+        self.allNumbers = list(range(1, shape.N + 1))
+#        the solver works on a flat grid, cell = row * N + col (0=empty).
+#        the "grid" attribute is only an import/export view of it
+        self.cells = bytearray(shape.cellCount)
+#        digits already used in each unit (see SudokuShape)
+        self.unitMask = [0] * (3 * shape.N)
+#        candidates removed from each cell by the propagation techniques
+        self.elimMask = [0] * shape.cellCount
+#        validation state, kept up to date on each placement
+        self.filledCount = 0
+        self.conflictCell = None
+#        placements (cell) and eliminations (previous elimMask, cell + cellCount) done
+#        since the grid was loaded. used to roll back a wrong guess without
+#        copying the grid
+        self.trail = []
+#        statistics are collected by wrappers set on the instance, see
+#        _instrument(), so that a solver without stats pays nothing for them
+        self.stats = None
+        if stats:
+            self.stats = stats if isinstance(stats, SudokuStats) else SudokuStats()
+            self._instrument()
+        if grid is not None:
+            self.grid = grid
 #        how deep the number of guess  will be
         self.deepLevelMax = deepLevelMax
         self.deepestLevel = 0
+#        guesses and propagation steps of the last search, and their budgets
+        self.nodeCount = 0
+        self.stepCount = 0
+        self.maxNodes = maxNodes
+        self.maxSteps = maxSteps
         self.maxTime = maxTime
-        self.startTime = time.time()
+        self._startSearch()
+#        guess cell selection, see _getBranchCell()
+        self.tieBreak = tieBreak
+        self.random = random.Random(seed)
+
+    @property
+    def grid(self):
+        cells = self.cells
+        N = self.N
+        return [list(cells[row_i * N:row_i * N + N]) for row_i in range(N)]
+
+    @grid.setter
+    def grid(self, grid):
+        self._loadGrid(grid)
 
 #print Grid   (0=empty)
     def printGrid(self, grid=None):
         if grid is None:
             grid = self.grid
-        for r in range(9):
-            if (r % 3) == 0:
-                print("+-----------+-----------+-----------+")
-            for c in range(9):
-                if (c % 3) == 0:
+        R, C = self.shape.size
+        width = len(str(self.N))
+        line = ("+" + "-" * (C * (width + 3) - 1)) * R + "+"
+        for r in range(self.N):
+            if (r % R) == 0:
+                print(line)
+            for c in range(self.N):
+                if (c % C) == 0:
                     print("| ", end="")
                 else:
                     print("  ", end="")
-                print("{} ".format(grid[r][c]), end="")
+                print("{:>{}} ".format(grid[r][c], width), end="")
             print("|")
-        print("+-----------+-----------+-----------+")
+        print(line)
 
     def solveGrid(self, grid=None):
         if grid is not None:
-            self.grid = copy.deepcopy(grid)
+            self.grid = grid
         if self.isValid():
             self._fillGrid()
         else:
             print("sudokuSolver - ERROR: supplied grid is invalid")
 
-    def _validateRow(self, row_i):
-        Valid = []
-        for col_i in range(9):
-            Number = self.grid[row_i][col_i]
-            if Number :
-                try:
-                    Valid.index(Number)
-                except ValueError:
-                    Valid.append(Number)
-                    continue
-                # if we are there then we have number twice
-                return False, row_i, col_i
-        return True, None, None
-
-    def _validateCol(self, col_i):
-        Valid = []
-        for row_i in range(9):
-            Number = self.grid[row_i][col_i]
-            if Number:
-                try:
-                    Valid.index(Number)
-                except ValueError:
-                    Valid.append(Number)
-                    continue
-                # if we are there then we have number twice
-                return False, row_i, col_i
-        return True, None, None
-
-    def _validateBox(self, box_i):
-        row_base = (box_i//3) * 3
-        col_base = (box_i % 3) * 3
-        Valid = []
-        for row_i in range(3):
-            for col_i in range(3):
-                Number = self.grid[row_base+row_i][col_base+col_i]
-                if Number:
-                    try:
-                        Valid.index(Number)
-                    except ValueError:
-                        Valid.append(Number)
-                        continue
-                    # if we are there then we have number twice
-                    return False, row_base+row_i, col_base+col_i
-        return True, None, None
+    def solve(self, grid=None, encoded=False):
+        """ solve the loaded grid (or grid) and return a SudokuResult, nothing
+            is raised. With encoded=True the grids are returned as bytes (see
+            encode_grid()) """
+        if grid is not None:
+            self.grid = grid
+        if not self.isValid():
+            return SudokuResult(0, INVALID, None, 0, 0.0)
+        try:
+            self._fillGrid()
+            status = SOLVED if self.isDone() else UNSOLVABLE
+        except SudokuDeepLevelError:
+            status = DEEPLEVEL
+        except SudokuTimeLimitError:
+            status = TIMEOUT
+        except SudokuBudgetError:
+            status = BUDGET
+        seconds = time.time() - self.startTime
+        solution = partial = None
+        if status == SOLVED:
+            solution = bytes(self.cells) if encoded else self.grid
+        elif status != UNSOLVABLE:
+            #  drop the guesses, keep what was deduced from the givens
+            if self.searchMark is not None:
+                sudokuSolver._undo(self, self.searchMark)
+            partial = bytes(self.cells) if encoded else self.grid
+        return SudokuResult(0, status, solution, self.deepestLevel, seconds,
+                            self.nodeCount, self.stepCount, partial)
 
     def _validateGrid(self):
-        # Get number of Empty digits
-        nbDigits = 0
-        for row_i in range(9):
-            nbDigits += (self.grid[row_i].count(0) + self.grid[row_i].count(None))
-
-        if (81 - nbDigits) < 17:
-            return False, 10, 10
-
-        for i in range(9):
-            valid, row, col = self._validateRow(i)
-            if not valid:
-                return False, row, col
-            valid, row, col = self._validateCol(i)
-            if not valid:
-                return False, row, col
-            valid, row, col = self._validateBox(i)
-            if not valid:
-                return False, row, col
+        # validation state is maintained by _loadGrid() and _setCell()
+        if self.filledCount < self.shape.minClues:
+            return False, self.N + 1, self.N + 1
+        if self.conflictCell is not None:
+            return False, self.shape.cellRow[self.conflictCell], self.shape.cellCol[self.conflictCell]
         return True, None, None
 
     def isValid(self):
         valid, _, _  = self._validateGrid()
         return valid
 
+    def _loadGrid(self, grid):
+        # import a list of rows (or a bytes encoding, see encode_grid())
+        # into the flat grid and rebuild masks and validation state.
+        # Placements keep them up to date after that
+        N = self.N
+        if len(grid) != (self.cellCount if isinstance(grid, (bytes, bytearray)) else N):
+            raise ValueError("sudokuSolver - grid size doesn't match a {}x{} grid".format(N, N))
+        cells = self.cells
+        for cell in range(self.cellCount):
+            cells[cell] = 0
+            self.elimMask[cell] = 0
+        for unit in range(3 * N):
+            self.unitMask[unit] = 0
+        self.filledCount = 0
+        self.conflictCell = None
+        if isinstance(grid, (bytes, bytearray)):
+            for cell, Number in enumerate(grid):
+                if Number:
+                    self._setCell(cell, Number)
+        else:
+            for row_i in range(N):
+                for col_i in range(N):
+                    Number = grid[row_i][col_i]
+                    if Number:
+                        self._setCell(row_i * N + col_i, Number)
+        del self.trail[:]
+
+    def _setCell(self, cell, Number):
+        self.cells[cell] = Number
+        bit = 1 << (Number - 1)
+        unitMask = self.unitMask
+        row_u, col_u, box_u = self.cellUnits[cell]
+        if (unitMask[row_u] | unitMask[col_u] | unitMask[box_u]) & bit:
+            # if we are there then we have number twice
+            if self.conflictCell is None:
+                self.conflictCell = cell
+        unitMask[row_u] |= bit
+        unitMask[col_u] |= bit
+        unitMask[box_u] |= bit
+        self.filledCount += 1
+        self.trail.append(cell)
+
+    def _clearCell(self, cell):
+        # undo a placement of the search. The grid has no duplicate then,
+        # so the digit leaves its units (setCell() handles edits)
+        bit = ~(1 << (self.cells[cell] - 1))
+        self.cells[cell] = 0
+        for unit in self.cellUnits[cell]:
+            self.unitMask[unit] &= bit
+        self.filledCount -= 1
+
+    def _undo(self, mark):
+        # remove every placement and elimination done after the trail was at length mark
+        trail = self.trail
+        cellCount = self.cellCount
+        while len(trail) > mark:
+            entry = trail.pop()
+            if entry < cellCount:
+                self._clearCell(entry)
+            else:
+                self.elimMask[entry - cellCount] = trail.pop()
+
+    def _eliminate(self, cell, bits):
+        # remove candidates bits from cell. return True if any was still there
+        if not self._getCellMask(cell) & bits:
+            return False
+        self.trail.append(self.elimMask[cell])
+        self.trail.append(cell + self.cellCount)
+        self.elimMask[cell] |= bits
+        return True
+
+    def setCell(self, row_i, col_i, Number):
+        """ place Number (0 to clear) and update the validation state """
+        # an edit may remove one copy of a duplicate or follow a search,
+        # reload so masks, conflict, eliminations and trail start clean
+        cells = bytearray(self.cells)
+        cells[row_i * self.N + col_i] = Number
+        self._loadGrid(cells)
+
+    def _getCellMask(self, cell):
+        if self.cells[cell]:
+            return 0
+        unitMask = self.unitMask
+        row_u, col_u, box_u = self.cellUnits[cell]
+        return self.allBits & ~(unitMask[row_u] | unitMask[col_u] | unitMask[box_u] |
+                                self.elimMask[cell])
+
     def _getRowPossibility(self, row_i):
-        allPossibility = self.allNumbers[:]
-        for Number in self.grid[row_i]:
-            if Number :
-                try:
-                    allPossibility.remove(Number)
-                except ValueError:
-                    pass
-        return allPossibility
+        return self.bitDigits[self.allBits & ~self.unitMask[row_i]][:]
 
     def _getColPossibility(self, col_i):
-        allPossibility = self.allNumbers[:]
-        for row_i in range(9):
-            Number = self.grid[row_i][col_i]
-            if Number:
-                try:
-                    allPossibility.remove(Number)
-                except ValueError:
-                    pass
-        return allPossibility
+        return self.bitDigits[self.allBits & ~self.unitMask[self.N + col_i]][:]
 
     def _getBoxPossibility(self, box_i):
-        allPossibility = self.allNumbers[:]
-        row_base = (box_i//3) * 3
-        col_base = (box_i % 3) * 3
+        return self.bitDigits[self.allBits & ~self.unitMask[2 * self.N + box_i]][:]
 
-        for row_i in range(3):
-            for col_i in range(3):
-                Number = self.grid[row_base + row_i][col_base + col_i]
-                if Number:
-                    try:
-                        allPossibility.remove(Number)
-                    except ValueError:
-                        pass
-        return allPossibility
+    def _getCellPossibility(self, row_i, col_i):
+        return self.bitDigits[self._getCellMask(row_i * self.N + col_i)][:]
+
+
+    def _startSearch(self):
+        self.startTime = time.time()
+        self.deadline = None if self.maxTime is None else self.startTime + self.maxTime
+        self.deepestLevel = 0
+        self.nodeCount = 0
+        self.stepCount = 0
+#        limits are checked when stepCount reaches nextCheck, see _checkLimits()
+        self.nextCheck = 0
+#        trail length at the first guess, see solve()
+        self.searchMark = None
 
-    def _getCellPossibility(self, row_i, col_i, rowP=None,
-                           colP=None, boxP=None):
-
-        def intersection(list1, list2):
-            list3 = [value for value in list1 if value in list2]
-            return list3
-        
-        if self.grid[row_i][col_i] :
-            return []
-        box_i = (row_i // 3) * 3 + (col_i // 3)
-
-        if rowP is None:
-            rowP = self._getRowPossibility(row_i)[:]
-        if colP is None:
-            colP = self._getColPossibility(col_i)[:]
-        if boxP is None:
-            boxP = self._getBoxPossibility(box_i)[:]
-        possibility = boxP[:]
-        possibility = intersection(possibility[:], rowP)[:]
-        possibility = intersection(possibility[:], colP)[:]
-        return possibility
+    def _checkLimits(self):
+        # called every LIMITCHECK steps from the propagation loops
+        if self.maxSteps is not None and self.stepCount > self.maxSteps:
+            raise SudokuBudgetError("steps", self.maxSteps)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SudokuTimeLimitError(self.maxTime)
+        self.nextCheck = self.stepCount + self.LIMITCHECK
+        if self.maxSteps is not None:
+            self.nextCheck = min(self.nextCheck, self.maxSteps + 1)
 
+    def _newNode(self):
+        # one more guess
+        self.nodeCount += 1
+        if self.maxNodes is not None and self.nodeCount > self.maxNodes:
+            raise SudokuBudgetError("guesses", self.maxNodes)
 
     def _fillGrid(self, deepLevel=0):
         if deepLevel == 0:
-            self.startTime = time.time()
+            self._startSearch()
         while True:
-            Number, row_i, col_i = self._getNextNumber()
+            self.stepCount += 1
+            if self.stepCount >= self.nextCheck:
+                self._checkLimits()
+            Number, cell = self._getNextNumber()
             if Number is None:
-                if row_i is not None:
+                if cell is not None:
                     return
-                if deepLevel > self.deepLevelMax:
+                if self._propagate():
+                    continue
+                if deepLevel == 0:
+                    self.searchMark = len(self.trail)
+                if self.deepLevelMax is not None and deepLevel > self.deepLevelMax:
                     raise SudokuDeepLevelError(self.deepLevelMax)
                 self.deepestLevel=max(self.deepestLevel, deepLevel+1)
                 self._huntForIt(deepLevel+1)
                 break
             else:
-                self.grid[row_i][col_i] = Number
+                self._setCell(cell, Number)
 #       self.printGrid()
 
+    # the _getNextNumber... methods return (Number, cell)
+    #   (Number, cell) : Number is the only choice for cell
+    #   (None, cell)   : dead end found at cell, the grid can't be solved
+    #   (None, None)   : nothing found
     def _getNextNumberByPossibility(self):
-        cols_possibility = 9*[None]
-        boxs_possibility = 9*[None]
-
-        for row_i in range(9):
-            row_possibility = self._getRowPossibility(row_i)
-            if len(row_possibility) == 0:
+        cells = self.cells
+        bitCount = self.bitCount
+        for row_i in range(self.N):
+            if self.unitMask[row_i] == self.allBits:
                 continue
-            for col_i in range(9):
-                if cols_possibility[col_i] is None:
-                    cols_possibility[col_i] = self._getColPossibility(col_i)
-                box_i = (row_i // 3) * 3 + (col_i // 3)
-                if boxs_possibility[box_i] is None:
-                    boxs_possibility[box_i] = self._getBoxPossibility(box_i)
-                possibility = self._getCellPossibility(row_i, col_i,
-                                                      row_possibility,
-                                                      cols_possibility[col_i],
-                                                      boxs_possibility[box_i])
-                if len(possibility) == 1:
-                    return possibility[0], row_i, col_i
-                if len(possibility) == 0:
-                    if self.grid[row_i][col_i] == 0:
-                        return None, row_i, col_i
-        return None, None, None
-
-    def _getBoxUniquePosition(self, box_i):
-        row_base = (box_i//3) * 3
-        col_base = (box_i % 3) * 3
-
-        boxPossibility = self._getBoxPossibility(box_i)
+            for cell in self.units[row_i]:
+                if cells[cell]:
+                    continue
+                mask = self._getCellMask(cell)
+                if bitCount[mask] == 1:
+                    return mask.bit_length(), cell
+                if mask == 0:
+                    return None, cell
+        return None, None
 
-        for Number in boxPossibility:
+    def _getUniquePosition(self, cells, usedMask):
+        # cells is the list of cells of one row, column or box
+        cellMasks = [self._getCellMask(cell) for cell in cells]
+        for Number in self.bitDigits[self.allBits & ~usedMask]:
+            bit = 1 << (Number - 1)
+            found = None
             count = 0
-            row_found = None
-            col_found = None
-            for row_i in range(3):
-                for col_i in range(3):
-                    cellPossibility = self._getCellPossibility(row_base+row_i,
-                                                              col_base+col_i)
-                    try:
-                        cellPossibility.index(Number)
-                    except ValueError:
-                        continue
+            for index, mask in enumerate(cellMasks):
+                if mask & bit:
                     count = count + 1
-                    row_found = row_i + row_base
-                    col_found = col_i + col_base
+                    found = index
             if count == 1:
                 #  we got one Number to a unique place
-                return Number, row_found, col_found
-        return None, None, None
+                return Number, cells[found]
+            if count == 0:
+                #  Number doesn't fit anywhere, dead end
+                return None, cells[0]
+        return None, None
 
-    def _getRowUniquePosition(self, row_i):
-        rowPossibility = self._getRowPossibility(row_i)
+    def _getBoxUniquePosition(self, box_i):
+        unit = 2 * self.N + box_i
+        return self._getUniquePosition(self.units[unit], self.unitMask[unit])
 
-        for Number in rowPossibility:
-            count = 0
-            col_found = None
-            for col_i in range(9):
-                cellPossibility = self._getCellPossibility(row_i, col_i)
-                try:
-                    cellPossibility.index(Number)
-                except ValueError:
-                    continue
-                count = count + 1
-                col_found = col_i
-            if count == 1:
-                #  we got one Number to a unique place
-                return Number, row_i, col_found
-        return None, None, None
+    def _getRowUniquePosition(self, row_i):
+        return self._getUniquePosition(self.units[row_i], self.unitMask[row_i])
 
     def _getColUniquePosition(self, col_i):
-        colPossibility = self._getColPossibility(col_i)
-
-        for Number in colPossibility:
-            count = 0
-            row_found = None
-            for row_i in range(9):
-                cellPossibility = self._getCellPossibility(row_i, col_i)
-                try:
-                    cellPossibility.index(Number)
-                except ValueError:
-                    continue
-                count = count + 1
-                row_found = row_i
-            if count == 1:
-                #  we got one Number to a unique place
-                return Number, row_found, col_i
-        return None, None, None
+        unit = self.N + col_i
+        return self._getUniquePosition(self.units[unit], self.unitMask[unit])
 
     def _getNextNumberByUniquePosition(self):
-        for box_index in range(9):
-            Number, row_i, col_i = self._getBoxUniquePosition(box_index)
-            if Number is not None:
-                return Number, row_i, col_i
-        for row_index in range(9):
-            Number, row_i, col_i = self._getRowUniquePosition(row_index)
-            if Number is not None:
-                return Number, row_i, col_i
-        for col_index in range(9):
-            Number, row_i, col_i = self._getColUniquePosition(col_index)
-            if Number is not None:
-                return Number, row_i, col_i
-        return None, None, None
+        for unit in self.shape.uniquePositionOrder:
+            Number, cell = self._getUniquePosition(self.units[unit], self.unitMask[unit])
+            if cell is not None:
+                return Number, cell
+        return None, None
 
 
     def isDone(self):
-        for row_i in range(9):
-            if all(self.grid[row_i]):
+        return self.filledCount == self.cellCount
+
+    def _getBranchCell(self):
+        # minimum remaining values: the empty cell with the fewest candidates.
+        # tieBreak picks between cells with the same number of candidates
+        #   "first"  : first one in row-major order
+        #   "degree" : the one with the most empty peers
+        #   "random" : any of them, using self.random
+        cells = self.cells
+        bitCount = self.bitCount
+        bestCount = self.N + 1
+        bestCells = []
+        for cell in range(self.cellCount):
+            if cells[cell]:
                 continue
-            return False
-        return True
+            count = bitCount[self._getCellMask(cell)]
+            if count < bestCount:
+                bestCount = count
+                bestCells = [cell]
+                if count <= 2 and self.tieBreak == "first":
+                    #  can't do better than two candidates
+                    return cell
+            elif count == bestCount:
+                bestCells.append(cell)
+        if not bestCells:
+            return None
+        if self.tieBreak == "random":
+            return self.random.choice(bestCells)
+        if self.tieBreak == "degree":
+            def degree(cell):
+                return sum(1 for peer in self.shape.peers[cell] if not cells[peer])
+            return max(bestCells, key=degree)
+        return bestCells[0]
 
     def _huntForIt(self, deepLevel=0):
-        originalGrid = self.grid
-        for row_i in range(9):
-            for col_i in range(9):
-                if self.grid[row_i][col_i]:
+        mark = len(self.trail)
+        cell = self._getBranchCell()
+        if cell is None:
+            return False
+        for guessNumber in self.bitDigits[self._getCellMask(cell)]:
+            self._newNode()
+            self._setCell(cell, guessNumber)
+            self._fillGrid(deepLevel)
+            if self.isDone():
+                return True
+            #  wrong guess, roll back to the original grid
+            self._undo(mark)
+        # no guess fits this cell, the grid we got is a dead end
+        return False
+
+    def _propagate(self):
+        # run the techniques until one of them removes candidates.
+        # _fillGrid() then looks for singles again, so this runs to a fixpoint
+        for technique in self.techniques:
+            if technique(self):
+                return True
+        return False
+
+    def _getUnitMasks(self, unit):
+        return [self._getCellMask(cell) for cell in self.units[unit]]
+
+    def _applyNakedSubsets(self, size):
+        # size cells of a unit sharing exactly size candidates:
+        # those candidates can be removed from the other cells of the unit
+        bitCount = self.bitCount
+        for unit in range(3 * self.N):
+            masks = self._getUnitMasks(unit)
+            subset = [index for index, mask in enumerate(masks)
+                      if 2 <= bitCount[mask] <= size]
+            if len(subset) < size:
+                continue
+            for combo in combinations(subset, size):
+                bits = 0
+                for index in combo:
+                    bits |= masks[index]
+                if bitCount[bits] != size:
+                    continue
+                found = False
+                for index, cell in enumerate(self.units[unit]):
+                    if index not in combo and masks[index] & bits:
+                        found = self._eliminate(cell, bits) or found
+                if found:
+                    return True
+        return False
+
+    def _applyHiddenSubsets(self, size):
+        # size digits of a unit that only fit in the same size cells:
+        # the other candidates can be removed from those cells
+        bitCount = self.bitCount
+        for unit in range(3 * self.N):
+            masks = self._getUnitMasks(unit)
+            places = {}
+            for Number in self.bitDigits[self.allBits & ~self.unitMask[unit]]:
+                bit = 1 << (Number - 1)
+                where = 0
+                for index, mask in enumerate(masks):
+                    if mask & bit:
+                        where |= 1 << index
+                if 2 <= bitCount[where] <= size:
+                    places[bit] = where
+            if len(places) < size:
+                continue
+            for combo in combinations(places, size):
+                where = 0
+                bits = 0
+                for bit in combo:
+                    where |= places[bit]
+                    bits |= bit
+                if bitCount[where] != size:
+                    continue
+                found = False
+                #  bitDigits gives the unit positions in where, plus one
+                for position in self.bitDigits[where]:
+                    found = (self._eliminate(self.units[unit][position - 1],
+                                             self.allBits & ~bits) or found)
+                if found:
+                    return True
+        return False
+
+    def _applyIntersection(self, units, positions):
+        # a digit whose places in one unit all share a second unit (box and
+        # row or column) can be removed from the rest of that second unit.
+        # positions are the kinds of second unit to check, as in cellUnits
+        cellUnits = self.cellUnits
+        for unit in units:
+            kind = unit // self.N
+            masks = self._getUnitMasks(unit)
+            for Number in self.bitDigits[self.allBits & ~self.unitMask[unit]]:
+                bit = 1 << (Number - 1)
+                cells = [cell for index, cell in enumerate(self.units[unit]) if masks[index] & bit]
+                if len(cells) < 2:
                     continue
-                cellPossibility = self._getCellPossibility(row_i, col_i)
-                for guessNumber in cellPossibility:
-                    #  copy original grid
-                    self.grid = copy.deepcopy(originalGrid)
-                    self.grid[row_i][col_i] = guessNumber
-                    self._fillGrid(deepLevel)
-                    if self.isDone():
+                for position in positions:
+                    target = cellUnits[cells[0]][position]
+                    if any(cellUnits[cell][position] != target for cell in cells):
+                        continue
+                    found = False
+                    for cell in self.units[target]:
+                        if cellUnits[cell][kind] != unit:
+                            found = self._eliminate(cell, bit) or found
+                    if found:
                         return True
-                    if (time.time() - self.startTime) > self.maxTime:
-                        raise SudokuTimeLimitError(self.maxTime)
         return False
 
+    def _applyPointing(self):
+        return self._applyIntersection(range(2 * self.N, 3 * self.N), (0, 1))
+
+    def _applyBoxLine(self):
+        return self._applyIntersection(range(2 * self.N), (2,))
+
+    def _applyNakedPairs(self):
+        return self._applyNakedSubsets(2)
+
+    def _applyNakedTriples(self):
+        return self._applyNakedSubsets(3)
+
+    def _applyHiddenPairs(self):
+        return self._applyHiddenSubsets(2)
+
+    def _applyHiddenTriples(self):
+        return self._applyHiddenSubsets(3)
+
+    def countSolutions(self, limit=2):
+        """ return the number of solutions of the loaded grid, counting stops at
+            limit. The grid is left as loaded. Raises SudokuTimeLimitError
+            or SudokuBudgetError """
+        if self.conflictCell is not None:
+            return 0
+        mark = len(self.trail)
+        self._startSearch()
+        try:
+            return self._countFrom(limit)
+        finally:
+            #  back to the loaded grid, not a backtrack for the stats
+            sudokuSolver._undo(self, mark)
+
+    def _countFrom(self, limit):
+        # same propagation as _fillGrid() but every guess is tried, until
+        # limit solutions are found. The caller rolls back the placements
+        while True:
+            self.stepCount += 1
+            if self.stepCount >= self.nextCheck:
+                self._checkLimits()
+            Number, cell = self._getNextNumber()
+            if Number is not None:
+                self._setCell(cell, Number)
+                continue
+            if cell is not None:
+                return 0
+            if self.isDone():
+                return 1
+            if not self._propagate():
+                break
+        cell = self._getBranchCell()
+        count = 0
+        for guessNumber in self.bitDigits[self._getCellMask(cell)]:
+            mark = len(self.trail)
+            self._newNode()
+            self._setCell(cell, guessNumber)
+            count += self._countFrom(limit - count)
+            self._undo(mark)
+            if count >= limit:
+                break
+        return count
+
     def _getNextNumber(self):
-        valid, row_i, col_i = self._validateGrid()
-        if not valid:
-            return None, row_i, col_i
-        Number, row_i, col_i = self._getNextNumberByPossibility()
-        if Number is None:
+        Number, cell = self._getNextNumberByPossibility()
+        if Number is None and cell is None:
             return self._getNextNumberByUniquePosition()
-        return Number, row_i, col_i
+        return Number, cell
+
+    def _instrument(self):
+        # shadow the methods to measure with counting and timing wrappers
+        stats = self.stats
+        clock = time.perf_counter
+
+        def counted(method, counter):
+            def wrapper():
+                Number, cell = method()
+                if Number is not None:
+                    setattr(stats, counter, getattr(stats, counter) + 1)
+                return Number, cell
+            return wrapper
+
+        def timed(method, phase):
+            def wrapper(*args):
+                startTime = clock()
+                try:
+                    return method(*args)
+                finally:
+                    setattr(stats, phase, getattr(stats, phase) + clock() - startTime)
+            return wrapper
+
+        def searched(method):
+            # one solve. the time spent out of the propagation is the search time
+            def wrapper(*args):
+                startTime = clock()
+                propagationTime = stats.propagationTime
+                stats.solves += 1
+                try:
+                    return method(*args)
+                finally:
+                    stats.guesses += self.nodeCount
+                    stats.searchTime += (clock() - startTime -
+                                         (stats.propagationTime - propagationTime))
+            return wrapper
+
+        def techniqueCounted(technique):
+            name = next((name for name, function in TECHNIQUES.items()
+                         if function is technique), getattr(technique, "__name__", None))
+            def wrapper(solver):
+                if technique(solver):
+                    stats.techniques[name] = stats.techniques.get(name, 0) + 1
+                    return True
+                return False
+            return wrapper
+
+        getNextNumber = self._getNextNumber
+        undo = self._undo
+        fillGrid = self._fillGrid
+        fillGridSolve = searched(fillGrid)
+        countFrom = self._countFrom
+
+        def _getNextNumber():
+            Number, cell = getNextNumber()
+            if Number is None and cell is not None:
+                stats.deadEnds += 1
+            return Number, cell
+
+        def _undo(mark):
+            stats.backtracks += 1
+            undo(mark)
+
+        def _fillGrid(deepLevel=0):
+            stats.nodes += 1
+            if deepLevel:
+                return fillGrid(deepLevel)
+            return fillGridSolve(deepLevel)
+
+        def _countFrom(limit):
+            stats.nodes += 1
+            return countFrom(limit)
+
+        self._getNextNumberByPossibility = counted(self._getNextNumberByPossibility,
+                                                   "nakedSingles")
+        self._getNextNumberByUniquePosition = counted(self._getNextNumberByUniquePosition,
+                                                      "hiddenSingles")
+        self._getNextNumber = timed(_getNextNumber, "propagationTime")
+        self._propagate = timed(self._propagate, "propagationTime")
+        self._undo = _undo
+        self._loadGrid = timed(self._loadGrid, "validationTime")
+        self._validateGrid = timed(self._validateGrid, "validationTime")
+        self._fillGrid = _fillGrid
+        self._countFrom = _countFrom
+        self.countSolutions = searched(self.countSolutions)
+        self.techniques = [techniqueCounted(technique) for technique in self.techniques]
+
 
     def _getAllCellsPossibility(self):
         allPossibility = []
-        cols_possibility = 9*[None]
-        boxs_possibility = 9*[None]
-        for row_i in range(9):
-            row_possibility = self._getRowPossibility(row_i)
-            for col_i in range(9):
-                if cols_possibility[col_i] is None:
-                    cols_possibility[col_i] = self._getColPossibility(col_i)
-                box_i = (row_i // 3) * 3 + col_i % 3
-                if boxs_possibility[box_i] is None:
-                    boxs_possibility[box_i] = self._getBoxPossibility(box_i)
-                possibility = self._getCellPossibility(row_i, col_i,
-                                                      row_possibility,
-                                                      cols_possibility[col_i],
-                                                      boxs_possibility[box_i])
+        N = self.N
+        for row_i in range(N):
+            for col_i in range(N):
+                possibility = self._getCellPossibility(row_i, col_i)
                 allPossibility.append([row_i, col_i,
-                                      self.grid[row_i][col_i],
+                                      self.cells[row_i * N + col_i],
                                       possibility[:]])
         return allPossibility
 
@@ -454,26 +960,65 @@ class sudokuSolver:
         if not valid:
             print("Grid Invalid Row:{}  Col:{}".format(row_i, col_i))
             return None, row_i, col_i
-        cols_possibility = 9*[None]
-        boxs_possibility = 9*[None]
-        for row_i in range(9):
+        N = self.N
+        cols_possibility = N*[None]
+        boxs_possibility = N*[None]
+        for row_i in range(N):
             row_possibility = self._getRowPossibility(row_i)
-            for col_i in range(9):
+            for col_i in range(N):
                 if cols_possibility[col_i] is None:
                     cols_possibility[col_i] = self._getColPossibility(col_i)
-                box_i = (row_i // 3) * 3 + col_i % 3
+                box_i = self.shape.cellBox[row_i * N + col_i]
                 if boxs_possibility[box_i] is None:
                     boxs_possibility[box_i] = self._getBoxPossibility(box_i)
-                possibility = self._getCellPossibility(row_i, col_i,
-                                                      row_possibility,
-                                                      cols_possibility[col_i],
-                                                      boxs_possibility[box_i])
+                possibility = self._getCellPossibility(row_i, col_i)
                 print("grid[{}][{}]={} p:{} pr:{} pc:{} pb:{}".format(
                         row_i, col_i,
-                        self.grid[row_i][col_i], possibility,
+                        self.cells[row_i * N + col_i], possibility,
                         row_possibility, cols_possibility[col_i],
                         boxs_possibility[box_i]))
 
+def encode_grid(grid):
+    """ return a grid (list of rows) as bytes, one digit value per cell
+        (81 bytes for a 9x9 grid) """
+    return bytes(Number or 0 for row in grid for Number in row)
+
+def decode_grid(data):
+    """ return the list of rows of a grid from encode_grid() """
+    N = int(round(len(data) ** 0.5))
+    if N * N != len(data):
+        raise ValueError("sudokuSolver - {} cells is not a square grid".format(len(data)))
+    return [list(data[row_i * N:row_i * N + N]) for row_i in range(N)]
+
+def count_solutions(grid, limit=2, **options):
+    """ return the number of solutions of grid, stopping as soon as limit
+        solutions are found. 0 if givens clash. options are sudokuSolver arguments
+    """
+    return sudokuSolver(grid, **options).countSolutions(limit)
+
+def solve_many(grids, deepLevelMax=sudokuSolver.DEEPLEVELMAX,
+               maxTime=sudokuSolver.MAXTIME, encoded=False, **options):
+    """ solve each grid of an iterable, yielding one SudokuResult per grid.
+        A single solver and its buffers are reused for all the grids and
+        failures are reported in the result status instead of raised.
+        grids are lists of rows or 81 bytes encodings (see encode_grid()).
+        With encoded=True the solved grids are returned as 81 bytes too.
+        options are the other sudokuSolver arguments.
+    """
+    solver = sudokuSolver(deepLevelMax=deepLevelMax, maxTime=maxTime, **options)
+    for index, grid in enumerate(grids):
+        yield solver.solve(grid, encoded)._replace(index=index)
+
+#  propagation techniques that can be named in sudokuSolver(propagation=...)
+TECHNIQUES = {
+    "pointing": sudokuSolver._applyPointing,
+    "boxLine": sudokuSolver._applyBoxLine,
+    "nakedPairs": sudokuSolver._applyNakedPairs,
+    "nakedTriples": sudokuSolver._applyNakedTriples,
+    "hiddenPairs": sudokuSolver._applyHiddenPairs,
+    "hiddenTriples": sudokuSolver._applyHiddenTriples,
+    }
+
 if __name__ == "__main__":
 ##HARDEST
     import sys
@@ -515,11 +1060,21 @@ if __name__ == "__main__":
 #---Test invalid Grid
 #
     print("sudokuSolver - testing INvalid sudoku grid : ", end="")
-    sudoku.grid[1][1]=8
+    sudoku.setCell(1, 1, 8)
     if not sudoku.isValid():
         print("PASSED")
     else:
         print("FAILED")
+#
+#---Test clearing the bad digit gives the valid grid back
+#
+    print("sudokuSolver - testing setCell() clearing a duplicate : ", end="")
+    sudoku.setCell(1, 1, 0)
+    if (sudoku.isValid() and sudoku.grid == hard_sudoku and
+            sudoku.countSolutions(2) == 1 and not sudoku.trail):
+        print("PASSED")
+    else:
+        print("FAILED")
 
 #
 #---Test too little time allowed (raise SudokuTimeLimitError)
@@ -542,10 +1097,10 @@ if __name__ == "__main__":
 #
 #---Test not enough recursive levels (raise SudokuDeepLevelError)
 #
-    print("sudokuSolver - testing with hard sudoku grid that requires 14 levels, using 5 ")
+    print("sudokuSolver - testing with hard sudoku grid that requires more than 1 level, using 1 ")
     print("               expecting 'SudokuDeepLevelError' raised : ",end="")
     target_sudoku = copy.deepcopy(hard_sudoku)
-    sudoku = sudokuSolver(deepLevelMax=5,maxTime=999)
+    sudoku = sudokuSolver(deepLevelMax=1,maxTime=999)
     sudoku.grid=target_sudoku
     try:
         sudoku.solveGrid()
@@ -557,13 +1112,16 @@ if __name__ == "__main__":
             print("sudokuSolver - Unexpected error :",str(erreur))
             print("sudokuSolver - exiting")
             sys.exit()
+    else:
+        print("FAILED")
+        print("sudokuSolver - Unexpected success with 1 level")
 #
 #---Test solution and provided by algorythm
 #
-    print("sudokuSolver - testing solutioning a hard sudoku grid")
+    print("sudokuSolver - testing solutioning a hard sudoku grid with the default levels")
     print("               expecting successful internal checks : ",end="")
     target_sudoku = copy.deepcopy(hard_sudoku)
-    sudoku = sudokuSolver(deepLevelMax=15,maxTime=999)
+    sudoku = sudokuSolver(maxTime=999)
     sudoku.grid=target_sudoku
     try:
         sudoku.solveGrid()
@@ -615,6 +1173,87 @@ if __name__ == "__main__":
     print("SOLUTION sudoku matrix")
     sudoku.printGrid()
 #
+#---Test batch solving, one valid and one invalid grid
+#
+    print("sudokuSolver - testing solve_many with a valid and an invalid grid : ", end="")
+    invalid_sudoku = copy.deepcopy(hard_sudoku)
+    invalid_sudoku[1][1] = 8
+    results = list(solve_many([hard_sudoku, invalid_sudoku]))
+    if ([result.status for result in results] == [SOLVED, INVALID] and
+            results[0].grid == hard_sudoku_solution):
+        print("PASSED")
+    else:
+        print("FAILED")
+        print("sudokuSolver - Unexpected results :", results)
+        sys.exit()
+#
+#---Test solution counting, unique and with two solutions
+#
+    print("sudokuSolver - testing count_solutions with a unique and an open grid : ", end="")
+    open_sudoku = copy.deepcopy(hard_sudoku)
+    open_sudoku[0][0] = 0
+    open_sudoku[1][2] = 0
+    if (count_solutions(hard_sudoku) == 1 and count_solutions(open_sudoku) == 2 and
+            count_solutions(invalid_sudoku) == 0):
+        print("PASSED")
+    else:
+        print("FAILED")
+        sys.exit()
+
+    print("sudokuSolver - testing search statistics : ", end="")
+    sudoku = sudokuSolver(hard_sudoku, stats=True)
+    sudoku.solveGrid()
+    stats = sudoku.stats
+    emptyCells = sum(1 for row in hard_sudoku for Number in row if not Number)
+    if (sudoku.isDone() and stats.solves == 1 and stats.guesses == sudoku.nodeCount and
+            stats.nodes == stats.guesses + 1 and stats.backtracks <= stats.guesses and
+            stats.nakedSingles + stats.hiddenSingles + stats.guesses >= emptyCells):
+        print("PASSED")
+    else:
+        print("FAILED", stats)
+        sys.exit()
+#
+#---Test guess budget, a partial result is returned instead of raising
+#
+    print("sudokuSolver - testing a budget of 2 guesses without depth limit : ", end="")
+    result = sudokuSolver(deepLevelMax=None, maxNodes=2).solve(hard_sudoku)
+    solved = sudokuSolver(deepLevelMax=None).solve(hard_sudoku)
+    if (result.status == BUDGET and result.grid is None and result.nodes == 3 and
+            all(Number in (0, hard_sudoku_solution[row_i][col_i])
+                for row_i, row in enumerate(result.partial)
+                for col_i, Number in enumerate(row)) and
+            solved.status == SOLVED and solved.grid == hard_sudoku_solution):
+        print("PASSED")
+    else:
+        print("FAILED")
+        print("sudokuSolver - Unexpected results :", result, solved)
+        sys.exit()
+#
+#---Test other grid sizes, 4x4 and 16x16
+#
+    print("sudokuSolver - testing 4x4 and 16x16 grids : ", end="")
+    sizes_ok = True
+    for size in ((2, 2), (4, 4)):
+        R, C = size
+        N = R * C
+        full_grid = [[(C * (row_i % R) + row_i // R + col_i) % N + 1 for col_i in range(N)]
+                     for row_i in range(N)]
+        # blank one cell out of two, in a checkerboard
+        open_grid = [[0 if (row_i + col_i) % 2 else Number for col_i, Number in enumerate(row)]
+                     for row_i, row in enumerate(full_grid)]
+        result = sudokuSolver(size=size, deepLevelMax=None).solve(open_grid)
+        shape = SudokuShape.get(size)
+        cells = [Number for row in (result.grid or []) for Number in row]
+        sizes_ok = sizes_ok and result.status == SOLVED and all(
+            sorted(cells[cell] for cell in unit) == list(range(1, N + 1))
+            for unit in shape.units)
+    if sizes_ok:
+        print("PASSED")
+    else:
+        print("FAILED")
+        print("sudokuSolver - Unexpected result :", result)
+        sys.exit()
+#
 # --- end of tests
 #
     print("sudokuSolver - Testing completed, exiting")